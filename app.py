@@ -1,5 +1,9 @@
 from src.chatwithcode.pipeline.chat_with_code import ChatWithCode
-from flask import Flask, render_template, request, jsonify
+from chatwithcode.components.repo_scan import RepoBudgetExceeded # same module as the pipeline raises it from
+from chatwithcode.components.profiler import SamplingProfiler, MemoryProfiler, ProfilingSession
+from chatwithcode.config.configuration import ConfigManager
+from flask import Flask, render_template, request, jsonify, abort, g
+import hmac
 
 
 app = Flask(__name__)
@@ -34,7 +38,7 @@ def embedding_process():
             str: The rendered index.html template with the success message.
 
         Raises:
-            Exception: If an error occurs during processing.
+            Exception: If an error occurs during processing. A repository exceeding the ingestion budget is reported in the message instead.
     """
     try:
         sms = None
@@ -46,6 +50,8 @@ def embedding_process():
                 sms=res
         return render_template("index.html", sms=sms)
 
+    except RepoBudgetExceeded as ex:
+        sms = str(ex) # rejected by the repo scan, nothing was embedded
     except Exception as ex:
         raise ex
     finally:
@@ -57,11 +63,15 @@ def generate_response():
     """
         Generate a response to a question received via a POST request.
 
+        The JSON body holds the "question" and optionally the answer "mode" ('auto', 'llm' or 'retrieval') and the "paths"
+        (path prefixes or globs, as a list or a comma separated string) the question is restricted to.
+
         Args:
             None
 
         Returns:
-            dict: A JSON object containing the generated answer.
+            dict: A JSON object containing the generated answer, or {"error": message} with status 400 for an unknown mode or
+                  paths that select no indexed file.
 
         Raises:
             Exception: If an error occurs during the generation of the response.
@@ -69,18 +79,118 @@ def generate_response():
     try:
         data = request.get_json()  # Get the JSON data from the request
         question = data.get("question")  # Extract the question from the JSON data
+        mode = data.get("mode", "auto")  # 'auto', 'llm' or 'retrieval' (source excerpts only, no LLM)
+        paths = data.get("paths")  # optional path prefixes or globs, e.g. ["src/chatwithcode/components", "*.py"]
+        if isinstance(paths, str):
+            paths = [path for path in paths.split(",") if path.strip()]
 
         # get the response:
         pro = ChatWithCode()
-        answer = pro.predict(question=question)
+        answer = pro.predict(question=question, mode=mode, paths=paths)
         return jsonify({"answer": answer})  # Return the answer as JSON
 
+    except ValueError as ex:
+        return jsonify({"error": str(ex)}), 400 # unknown mode, or paths that select no indexed file
     except Exception as ex:
        raise ex
 
 
 
 
+def register_profiling(app:Flask) -> None:
+    """
+        Registers the admin-only profiling endpoints and the per-request profiling hooks.
+
+        Nothing is registered unless profiling is enabled in params.yaml and the PROFILING_ADMIN_TOKEN environment variable
+        is set, so a disabled profiler adds no overhead at all. Every endpoint (and the X-Profile header) requires the
+        X-Admin-Token header; without it the endpoints answer 404.
+
+        Endpoints:
+            POST /admin/profile/cpu/start        -> sample all threads, JSON {"seconds": N} or {"requests": N}
+            POST /admin/profile/cpu/stop         -> stop & return the collapsed stacks (flamegraph.pl / speedscope input)
+            GET  /admin/profile/cpu              -> status, or the collapsed stacks with ?format=collapsed
+            POST /admin/profile/memory/snapshot  -> tracemalloc snapshot, JSON {"label": name}
+            GET  /admin/profile/memory/diff      -> growth between ?base= and ?current= (default: the two latest snapshots)
+            POST /admin/profile/memory/stop      -> stop tracemalloc & drop the snapshots
+
+        Per request, the header "X-Profile: cpu", "memory" or "cpu,memory" profiles only that request; the written profiles
+        (in the profiles directory) are named in the X-Profile-Files response header.
+    """
+    profiling_config = ConfigManager().get_profiling_config()
+    if not (profiling_config.enabled and profiling_config.admin_token):
+        return
+
+    cpu_profiler = SamplingProfiler(config=profiling_config)
+    memory_profiler = MemoryProfiler(config=profiling_config)
+
+    def is_admin() -> bool:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), profiling_config.admin_token)
+
+    def require_admin() -> None:
+        if not is_admin():
+            abort(404)
+
+    @app.before_request
+    def start_request_profiling():
+        kinds = {kind.strip() for kind in request.headers.get("X-Profile", "").lower().split(",")} & {"cpu", "memory"}
+        if kinds and is_admin():
+            g.profiling_session = ProfilingSession(config=profiling_config, kinds=kinds).start()
+
+    @app.after_request
+    def finish_request_profiling(response):
+        if not request.path.startswith("/admin/profile"):
+            cpu_profiler.request_finished()
+        session = g.pop("profiling_session", None)
+        if session is not None:
+            response.headers["X-Profile-Files"] = ",".join(session.finish())
+        return response
+
+    @app.route("/admin/profile/cpu/start", methods=["POST"])
+    def start_cpu_profile():
+        require_admin()
+        data = request.get_json(silent=True) or {}
+        try:
+            cpu_profiler.start(seconds=data.get("seconds"), requests=data.get("requests"))
+        except RuntimeError as ex:
+            return jsonify({"error": str(ex)}), 409
+        return jsonify(cpu_profiler.status())
+
+    @app.route("/admin/profile/cpu/stop", methods=["POST"])
+    def stop_cpu_profile():
+        require_admin()
+        return cpu_profiler.stop(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+    @app.route("/admin/profile/cpu", methods=["GET"])
+    def get_cpu_profile():
+        require_admin()
+        if request.args.get("format") == "collapsed":
+            return cpu_profiler.collapsed(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+        return jsonify(cpu_profiler.status())
+
+    @app.route("/admin/profile/memory/snapshot", methods=["POST"])
+    def take_memory_snapshot():
+        require_admin()
+        data = request.get_json(silent=True) or {}
+        return jsonify(memory_profiler.snapshot(label=data.get("label")))
+
+    @app.route("/admin/profile/memory/diff", methods=["GET"])
+    def diff_memory_snapshots():
+        require_admin()
+        try:
+            return jsonify(memory_profiler.diff(base=request.args.get("base"), current=request.args.get("current")))
+        except KeyError as ex:
+            return jsonify({"error": str(ex)}), 404
+
+    @app.route("/admin/profile/memory/stop", methods=["POST"])
+    def stop_memory_profile():
+        require_admin()
+        return jsonify({"tracing": memory_profiler.stop()}) # still tracing while a profiled request needs it
+
+
+register_profiling(app)
+
+
+
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,125 @@
+from chatwithcode.utils.common_utils import log, read_json_file, write_json_file_atomic
+from chatwithcode.entity.config_entity import CacheWarmupConfig
+from chatwithcode.components.generate_answer import is_lookup_question
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import threading
+import os
+import re
+
+
+def normalize_question(question:str) -> str:
+    """
+        Returns the key under which a question is counted & cached: lower case, single spaces, without trailing punctuation.
+    """
+    return re.sub(r"\s+", " ", (question or "").strip().lower()).rstrip(" ?!.")
+
+
+class CacheWarmer:
+    """
+        The CacheWarmer class warms a freshly promoted knowledge base, so the first users after a rebuild don't pay the cold start:
+            1. mines the most frequent & most recent questions asked about the repository from the chat history,
+            2. runs their retrieval, which loads the embedding model and faults the chromadb pages into memory,
+            3. optionally precomputes the LLM answers of the top questions (at most `llm_budget` LLM calls) into `answers.json`
+               of the generation, which `predict` serves before calling the LLM.
+        Everything runs on a background thread with at most `concurrency` questions in flight.
+    """
+    ANSWERS_FILE = "answers.json"
+
+    def __init__(self, config: CacheWarmupConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+
+
+    def mine_questions(self, repo:str) -> list:
+        """
+            Returns the questions worth warming for a repository: half of `max_questions` by frequency, the rest by recency.
+
+            Args:
+                repo (str): The url of the repository.
+
+            Returns:
+                list: The questions, most valuable first.
+        """
+        history = [entry for entry in read_json_file(file_path=self.config.chat_file, default=[])
+                   if entry.get("repo") == repo and entry.get("question")]
+
+        counts, latest = Counter(), {}
+        for position, entry in enumerate(history): # the chat history is in insertion order
+            key = normalize_question(entry["question"])
+            counts[key] += 1
+            latest[key] = (position, entry["question"])
+
+        frequent = [key for key, _ in counts.most_common(self.config.max_questions // 2)]
+        recent = sorted(latest, key=lambda key: latest[key][0], reverse=True)
+        keys = list(dict.fromkeys(frequent + recent))[:self.config.max_questions]
+        return [latest[key][1] for key in keys]
+
+
+    def warm(self, repo:str, generation_dir:str, retriever_factory, qa_chain_factory=None) -> dict:
+        """
+            Run the retrieval of the mined questions and precompute the answers of the top ones within the LLM budget.
+
+            Args:
+                repo (str): The url of the repository.
+                generation_dir (str): The knowledge-base generation to warm.
+                retriever_factory (callable): Returns a retriever of the generation.
+                qa_chain_factory (callable): Returns a QA chain of the generation, None to skip the answers.
+
+            Returns:
+                dict: {"questions": number warmed, "answers": number of precomputed answers}
+        """
+        try:
+            questions = self.mine_questions(repo=repo)
+            if not questions:
+                return {"questions": 0, "answers": 0}
+
+            budget = self.config.llm_budget if qa_chain_factory is not None else 0
+            to_answer = set([question for question in questions if not is_lookup_question(question)][:budget])
+            answers = {}
+
+            def warm_question(question):
+                retriever_factory().get_relevant_documents(question) # load the model & fault the index pages in
+                if question in to_answer:
+                    result = qa_chain_factory().invoke(question)
+                    answers[normalize_question(question)] = result["result"].strip()
+
+            with ThreadPoolExecutor(max_workers=self.config.concurrency) as executor:
+                for question, future in [(question, executor.submit(warm_question, question)) for question in questions]:
+                    try:
+                        future.result()
+                    except Exception as ex:
+                        log(file_object=self.log_file, log_message=f"warm-up of '{question}' failed: {ex}") # a failed question doesn't stop the others
+
+            if answers:
+                write_json_file_atomic(file_path=os.path.join(generation_dir, self.ANSWERS_FILE), data=answers)
+            log(file_object=self.log_file, log_message=f"warmed '{len(questions)}' questions & precomputed '{len(answers)}' answers for '{repo}'") # logs the message
+
+            return {"questions": len(questions), "answers": len(answers)}
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def start(self, **kwargs) -> threading.Thread:
+        """
+            Run `warm` (same arguments) on a background thread and return the thread.
+        """
+        thread = threading.Thread(target=self._warm_in_background, kwargs=kwargs, name="knowledgebase-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+    def _warm_in_background(self, **kwargs) -> None:
+        try:
+            self.warm(**kwargs)
+        except Exception:
+            pass # already logged, warming is best effort
+
+
+    def cached_answer(self, generation_dir:str, question:str) -> str:
+        """
+            Returns the precomputed answer of a question for the generation, or None.
+        """
+        return read_json_file(file_path=os.path.join(generation_dir, self.ANSWERS_FILE), default={}).get(normalize_question(question))
@@ -44,6 +44,24 @@ class DataIngestion:
         except Exception as ex:
             log(file_object=self.log_file, log_message=f"Error occurred: {ex}")
             raise ex
+
+
+    def get_commit(self) -> str:
+        """
+            Returns the commit (hexsha) of the cloned GitHub repository.
+
+            Raises:
+                Exception: If the directory is not a git repository.
+
+            Returns:
+                str: The hexsha of the checked-out commit.
+        """
+        try:
+            return Repo(self.config.github_dir).head.commit.hexsha
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}")
+            raise ex
         
 
 
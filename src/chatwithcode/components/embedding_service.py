@@ -0,0 +1,292 @@
+from chatwithcode.utils.common_utils import log
+from chatwithcode.entity.config_entity import EmbeddingServiceConfig
+from langchain_core.embeddings import Embeddings
+from concurrent.futures import Future
+from typing import List
+import socketserver
+import threading
+import socket
+import struct
+import queue
+import json
+import time
+import os
+
+
+# clients shared by all the requests of a worker process, so the connection to the sidecar is reused.
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _send_message(sock:socket.socket, message:dict) -> None:
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(payload)) + payload) # 4 bytes length prefix + json
+
+
+def _receive_exactly(sock:socket.socket, size:int) -> bytes:
+    data = b""
+    while len(data) < size:
+        block = sock.recv(size - len(data))
+        if not block:
+            raise ConnectionError("connection closed by the peer")
+        data += block
+    return data
+
+
+def _receive_message(sock:socket.socket) -> dict:
+    size = struct.unpack(">I", _receive_exactly(sock, 4))[0]
+    return json.loads(_receive_exactly(sock, size).decode("utf-8"))
+
+
+def use_unix_socket(config:EmbeddingServiceConfig) -> bool:
+    """
+        Returns True if the service listens on a unix socket, False for localhost TCP (e.g. on windows).
+    """
+    return bool(config.socket_path) and hasattr(socket, "AF_UNIX")
+
+
+class MicroBatcher:
+    """
+        Collects the encode requests of all the connections and encodes them together: a batch is sent to the model as soon as
+        it holds `max_batch_size` texts or the first request waited `max_wait_ms`.
+    """
+    def __init__(self, embeddings:Embeddings, max_batch_size:int, max_wait_ms:int) -> None:
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True).start()
+
+
+    def submit(self, texts:List[str]) -> Future:
+        future = Future()
+        self.requests.put((texts, future))
+        return future
+
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                size += len(batch[-1][0])
+
+            try:
+                vectors = self.embeddings.embed_documents([text for texts, _ in batch for text in texts])
+                offset = 0
+                for texts, future in batch:
+                    future.set_result(vectors[offset:offset + len(texts)])
+                    offset += len(texts)
+            except Exception as ex:
+                for _, future in batch:
+                    future.set_exception(ex)
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """
+        Serves the requests of one (persistent) client connection.
+    """
+    def handle(self) -> None:
+        while True:
+            try:
+                message = _receive_message(self.request)
+            except (ConnectionError, OSError, struct.error):
+                return # the client closed the connection
+
+            try:
+                if message.get("op") == "ping":
+                    response = {"ok": True, "model": self.server.model_name}
+                elif message.get("op") == "embed":
+                    response = {"vectors": self.server.batcher.submit(message["texts"]).result()}
+                else:
+                    response = {"error": f"unknown op '{message.get('op')}'"}
+            except Exception as ex:
+                response = {"error": str(ex)}
+            _send_message(self.request, response)
+
+
+class EmbeddingServer:
+    """
+        The EmbeddingServer class is a local sidecar that loads the embedding model once per node and encodes the texts of all
+        the web workers, micro-batched, over a unix socket (or localhost TCP where unix sockets are not available).
+
+        Run it with: python -m chatwithcode.components.embedding_service
+    """
+    def __init__(self, config: EmbeddingServiceConfig, embeddings:Embeddings, model_name:str) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+
+    def serve_forever(self) -> None:
+        """
+            Start listening and serve the encode requests until the process is stopped.
+        """
+        try:
+            if use_unix_socket(self.config):
+                if os.path.exists(self.config.socket_path):
+                    os.remove(self.config.socket_path) # stale socket of a previous run
+                server = socketserver.ThreadingUnixStreamServer(self.config.socket_path, _EmbeddingRequestHandler)
+                address = self.config.socket_path
+            else:
+                socketserver.ThreadingTCPServer.allow_reuse_address = True
+                server = socketserver.ThreadingTCPServer((self.config.host, self.config.port), _EmbeddingRequestHandler)
+                address = f"{self.config.host}:{self.config.port}"
+
+            server.daemon_threads = True
+            server.model_name = self.model_name
+            server.batcher = MicroBatcher(embeddings=self.embeddings, max_batch_size=self.config.max_batch_size, max_wait_ms=self.config.max_wait_ms)
+            log(file_object=self.log_file, log_message=f"embedding service for '{self.model_name}' listening on '{address}'") # logs the message
+
+            with server:
+                server.serve_forever()
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+class EmbeddingServiceClient(Embeddings):
+    """
+        Embeddings that are computed by the embedding service. The connection is kept open and reused by all the requests of
+        the process (calls are serialized by a lock), and re-established once if it was refused or reset (e.g. the service
+        restarted). A timeout is never retried, the service may still be encoding the request. Large inputs are sent in
+        pieces of `max_batch_size` texts, so every request finishes well within the timeout.
+
+        With a `local_factory`, a call that can't reach the service (not running, refused, reset, or serving another model) is
+        answered by the in-process model instead, loaded on first use; the next call tries the service again.
+    """
+    def __init__(self, config: EmbeddingServiceConfig, model_name:str=None, local_factory=None) -> None:
+        self.config = config
+        self.model_name = model_name
+        self.local_factory = local_factory
+        self.log_file = "logs/logs.log"
+        self.lock = threading.Lock()
+        self.sock = None
+        self.local = None
+        self.local_lock = threading.Lock()
+        self.using_local = False
+
+
+    def _connect(self) -> socket.socket:
+        if use_unix_socket(self.config):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.config.timeout)
+            sock.connect(self.config.socket_path)
+        else:
+            sock = socket.create_connection((self.config.host, self.config.port), timeout=self.config.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if self.model_name is not None: # a service restarted with another model must not answer
+            _send_message(sock, {"op": "ping"})
+            model = _receive_message(sock).get("model")
+            if model != self.model_name:
+                sock.close()
+                raise ConnectionRefusedError(f"the embedding service serves '{model}', expected '{self.model_name}'")
+        return sock
+
+
+    def _request(self, message:dict) -> dict:
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self.sock = self._connect()
+                    _send_message(self.sock, message)
+                    response = _receive_message(self.sock)
+                    break
+                except OSError as ex:
+                    if self.sock is not None:
+                        self.sock.close() # the stream may hold a partial message, never reuse it
+                    self.sock = None
+                    if attempt == 1 or not isinstance(ex, ConnectionError): # refused, reset or closed by the peer
+                        raise
+        if "error" in response:
+            raise RuntimeError(f"embedding service error: {response['error']}")
+        return response
+
+
+    def _local_embeddings(self) -> Embeddings:
+        with self.local_lock:
+            if self.local is None:
+                self.local = self.local_factory()
+            return self.local
+
+
+    def ping(self) -> dict:
+        return self._request({"op": "ping"})
+
+
+    def embed_documents(self, texts:List[str]) -> List[List[float]]:
+        texts, vectors = list(texts), []
+        try:
+            for start in range(0, len(texts), self.config.max_batch_size):
+                vectors.extend(self._request({"op": "embed", "texts": texts[start:start + self.config.max_batch_size]})["vectors"])
+        except (FileNotFoundError, ConnectionError) as ex: # not running, refused or reset; a timeout is raised as it is
+            if self.local_factory is None:
+                raise
+            if not self.using_local:
+                log(file_object=self.log_file, log_message=f"embedding service unavailable ({ex}), use the in-process model") # log the message
+                self.using_local = True
+            return self._local_embeddings().embed_documents(texts)
+
+        if self.using_local:
+            log(file_object=self.log_file, log_message=f"embedding service available again") # log the message
+            self.using_local = False
+        return vectors
+
+
+    def embed_query(self, text:str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def get_embedding_service_client(config: EmbeddingServiceConfig, model_name:str, local_factory=None) -> EmbeddingServiceClient:
+    """
+        Returns the (shared) client of the embedding service.
+
+        Args:
+            config (EmbeddingServiceConfig): The configuration of the service.
+            model_name (str): The embedding model the knowledge base was built with.
+            local_factory (callable): Loads the model in-process; with it, the client is always returned and falls back to the
+                                      in-process model on every call the service can't answer (see `EmbeddingServiceClient`).
+
+        Returns:
+            EmbeddingServiceClient: The client, or None if the service is unavailable (only without a `local_factory`).
+    """
+    key = config.socket_path if use_unix_socket(config) else f"{config.host}:{config.port}"
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = EmbeddingServiceClient(config=config, model_name=model_name, local_factory=local_factory)
+        elif client.local_factory is None:
+            client.local_factory = local_factory
+    if local_factory is not None:
+        return client
+    try:
+        client.ping()
+        return client
+    except (ConnectionError, OSError, RuntimeError):
+        return None
+
+
+
+if __name__ == "__main__":
+    from chatwithcode.config.configuration import ConfigManager
+    from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+    config_manager = ConfigManager()
+    store_embedding_vectordb_config = config_manager.get_store_embedding_vectordb_config()
+
+    emb = StoreEmbeddings(config=store_embedding_vectordb_config)
+    server = EmbeddingServer(config=store_embedding_vectordb_config.embedding_service,
+                             embeddings=emb.load_local_embedding_model(),
+                             model_name=store_embedding_vectordb_config.embedding_model_name)
+    server.serve_forever()
@@ -7,6 +7,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+import re
 
 
 # Load environment variables from .env file
@@ -14,12 +15,68 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 
+# custom summary prompt (used to reduce the package summaries into the repo summary):
+CUSTOM_SUMMARY_PROMPT = '''Generate the overall summary of the following text (within the 512 words) that includes the following below elements:
+
+* A title that accurately reflects the content of the text.
+* An introduction paragraph that provides an overview of the topic.
+* Bullet points that list the key points of the text.
+* A conclusion paragraph that summarizes the main points of the text.
+
+Text:`{context}`'''
+
+# questions that only need the location / source of some code, answered without the LLM:
+LOOKUP_QUESTION_PATTERN = re.compile(
+    r"^\s*(where\s+(is|are|do|does)\b|show\s+(me\s+)?(the\s+)?(code|source|implementation|definition)\b"
+    r"|find\s+(the\s+)?(definition|code|source|usages?|function|class|method)\b|(definition|source|implementation)\s+of\b|go\s+to\b)",
+    re.IGNORECASE
+)
+
+
+def is_lookup_question(question:str) -> bool:
+    """
+        Returns True for "where is X defined?" / "show me the code for Y" questions, which are answered with the source excerpts only.
+    """
+    return bool(LOOKUP_QUESTION_PATTERN.search(question or ""))
+
+
+def format_excerpts(documents:list, max_excerpt_lines:int) -> str:
+    """
+        Formats retrieved chunks as ranked source excerpts ("path:start-end" followed by the code) for the chat window.
+    """
+    if not documents:
+        return "Unfortunately, I don't have the information."
+
+    excerpts = []
+    for rank, document in enumerate(documents, start=1):
+        location = document.metadata.get("path") or document.metadata.get("source", "unknown")
+        if document.metadata.get("start_line"):
+            location += f":{document.metadata['start_line']}-{document.metadata['end_line']}"
+        if document.metadata.get("symbol"):
+            location += f" ({document.metadata['symbol']})"
+
+        lines = document.page_content.strip("\n").splitlines()
+        code = "\n".join(lines[:max_excerpt_lines]) + ("\n..." if len(lines) > max_excerpt_lines else "")
+        excerpts.append(f"{rank}. {location}\n{code}")
+    return "\n\n".join(excerpts)
+
+
+# overview prompt (answers broad questions from the precomputed repo & package summaries):
+OVERVIEW_PROMPT = '''Use the following summaries of a code repository (separated with <ctx></ctx>) to answer the question.
+<ctx>
+{context}
+</ctx>
+{question}
+Helpful Answer:'''
+
+
 class GenerateResponse:
     """
         The GenerateResponse class is responsible for generating responses to questions using a language model (LLM) and a retrieval-based question answering (QA) chain. It loads the LLM, creates the QA chain, and generates a response based on the given question.
     """
-    def __init__(self, config:LLMConfig) -> None:
+    def __init__(self, config:LLMConfig, repo:str=None) -> None:
         self.config = config
+        self.repo = repo # url of the repository the knowledge base was built from, recorded in the chat history
         self.log_file = "logs/logs.log"
 
     
@@ -93,17 +150,6 @@ class GenerateResponse:
             """
             qa_prompt = PromptTemplate(template=qa_template, input_variables=['context', 'chat_history', 'question']) # define Prompt template
 
-            # create custom summary prompt:
-            custom_summary_prompt='''Generate the overall summary of the following text (within the 512 words) that includes the following below elements:
-
-            * A title that accurately reflects the content of the text.
-            * An introduction paragraph that provides an overview of the topic.
-            * Bullet points that list the key points of the text.
-            * A conclusion paragraph that summarizes the main points of the text.
-
-            Text:`{context}`'''
-            custom_summary_template = PromptTemplate(template=custom_summary_prompt, input_variables=['context'])
-
             # define memory:
             memory = ConversationBufferWindowMemory(
                 llm=self.load_llm(),
@@ -124,7 +170,7 @@ class GenerateResponse:
                                                     chain_type_kwargs=chain_type_kwargs
                                                 )
         
-            log(file_object=self.log_file, log_message=f"create qa prompt, custom summary prompt, define memory i.e. 'ConversationBufferWindowMemory, k=3', define RetrievalQA and return the qa_chain") # logs the message
+            log(file_object=self.log_file, log_message=f"create qa prompt, define memory i.e. 'ConversationBufferWindowMemory, k=3', define RetrievalQA and return the qa_chain") # logs the message
 
             return qa_chain
     
@@ -149,22 +195,90 @@ class GenerateResponse:
         """
         try:
             self.ans = qa_chain.invoke(question) # get the response
-            self.data_dct = {
-                "date": str(datetime.now().date()), "time": str(datetime.now().strftime("%H:%M:%S")),
-                "question": question,
-                "answer": self.ans['result'].strip()
-            }
+            return self.store_answer(question=question, answer=self.ans['result'].strip(), mode="llm")
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def generate_retrieval_response(self, retriever, question:str, max_excerpt_lines:int) -> str:
+        """
+            Answers a question with the ranked source excerpts of the retriever, without calling the LLM.
+
+            Args:
+                retriever (object): The retriever object (see `StoreEmbeddings.retriever`).
+                question (str): The question for which the response needs to be generated.
+                max_excerpt_lines (int): The maximum number of lines shown per excerpt.
 
-            insert_data_tojson_file(file_path=self.config.json_file, data_dct=self.data_dct) # insert data to json file
-            log(file_object=self.log_file, log_message=f"get the response based on result and store into '{self.config.json_file}'") # logs the message
+            Returns:
+                str: The source excerpts with their file paths & line ranges.
+
+            Raises:
+                Exception: If an error occurs during the retrieval.
+        """
+        try:
+            documents = retriever.get_relevant_documents(question) # no llm round trip
+            log(file_object=self.log_file, log_message=f"answer with '{len(documents)}' source excerpts, without the llm") # logs the message
 
-            return self.ans['result'].strip()
+            return self.store_answer(question=question, answer=format_excerpts(documents=documents, max_excerpt_lines=max_excerpt_lines), mode="retrieval")
 
         except Exception as ex:
             log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
             raise ex
 
 
+    def generate_overview_response(self, context:str, question:str) -> str:
+        """
+            Answers a broad (overview) question with one small prompt built from the precomputed repo & package summaries.
+
+            Args:
+                context (str): The summaries used as context.
+                question (str): The question for which the response needs to be generated.
+
+            Returns:
+                str: The generated response to the given question.
+
+            Raises:
+                Exception: If an error occurs during the generation of the response.
+        """
+        try:
+            prompt = PromptTemplate(template=OVERVIEW_PROMPT, input_variables=['context', 'question']).format(context=context, question=question)
+            answer = self.load_llm().invoke(prompt) # one call, no retrieval
+            log(file_object=self.log_file, log_message=f"answer the overview question from the repo summaries ({len(prompt)} chars prompt)") # logs the message
+
+            return self.store_answer(question=question, answer=answer.content.strip(), mode="overview")
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def store_answer(self, question:str, answer:str, mode:str) -> str:
+        """
+            Stores the question & answer into the chat history json file.
+
+            Args:
+                question (str): The question.
+                answer (str): The answer to the question.
+                mode (str): How the answer was generated: 'llm', 'overview', 'retrieval' or 'cached'.
+
+            Returns:
+                str: The answer.
+        """
+        self.data_dct = {
+            "date": str(datetime.now().date()), "time": str(datetime.now().strftime("%H:%M:%S")),
+            "question": question,
+            "answer": answer,
+            "mode": mode,
+            "repo": self.repo
+        }
+
+        insert_data_tojson_file(file_path=self.config.json_file, data_dct=self.data_dct) # insert data to json file
+        log(file_object=self.log_file, log_message=f"get the response based on result and store into '{self.config.json_file}'") # logs the message
+
+        return answer
+
 
 if __name__ == "__main__":
     from chatwithcode.config.configuration import ConfigManager
@@ -0,0 +1,212 @@
+from chatwithcode.utils.common_utils import log, clean_prev_dirs_if_exis, create_dir, read_json_file, write_json_file_atomic
+from chatwithcode.entity.config_entity import StoreEmbeddingVectorDBConfig
+from chromadb.api.client import SharedSystemClient
+from datetime import datetime
+import os
+import time
+
+
+def release_chromadb(persist_directory:str) -> None:
+    """
+        Stops the chromadb system of a directory (HNSW index, sqlite handles) and drops it from chromadb's per-path system
+        cache, which otherwise keeps every generation ever opened by the process in memory, even after it was deleted.
+    """
+    system = SharedSystemClient._identifer_to_system.pop(str(persist_directory), None)
+    if system is not None:
+        system.stop()
+
+
+class KnowledgeBaseGenerations:
+    """
+        The KnowledgeBaseGenerations class manages blue/green builds of the knowledge base. Every build is written into its own
+        generation directory, and a small pointer file (CURRENT) names the generation that serves queries. Promoting a new
+        generation is a single atomic rename of the pointer file, so queries never see a missing or half-built index.
+
+        Layout of the chromadb directory:
+            CURRENT                   -> name of the active generation
+            generations/<id>/         -> one chromadb per build
+            generations/<id>/generation.json -> status & timestamps of the build
+    """
+    POINTER_FILE = "CURRENT"
+    GENERATIONS_DIR = "generations"
+    METADATA_FILE = "generation.json"
+
+    def __init__(self, config: StoreEmbeddingVectorDBConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.root_dir = str(self.config.chromadb_dir)
+        self.generations_dir = os.path.join(self.root_dir, self.GENERATIONS_DIR)
+        self.pointer_file = os.path.join(self.root_dir, self.POINTER_FILE)
+
+
+    def generation_path(self, generation_id:str) -> str:
+        """
+            Returns the directory of the given generation.
+        """
+        return os.path.join(self.generations_dir, generation_id)
+
+
+    def read_metadata(self, generation_id:str) -> dict:
+        """
+            Returns the metadata (generation.json) of the given generation, or an empty dict if it has none.
+        """
+        return read_json_file(file_path=os.path.join(self.generation_path(generation_id), self.METADATA_FILE), default={})
+
+
+    def update_metadata(self, generation_id:str, **fields) -> dict:
+        """
+            Updates the metadata (generation.json) of the given generation with the given fields.
+
+            Returns:
+                dict: The updated metadata.
+        """
+        metadata = self.read_metadata(generation_id)
+        metadata.update(fields)
+        write_json_file_atomic(file_path=os.path.join(self.generation_path(generation_id), self.METADATA_FILE), data=metadata)
+        return metadata
+
+
+    def get_active_generation(self) -> str:
+        """
+            Returns the id of the generation the pointer file refers to, or None if nothing has been promoted yet.
+        """
+        if not os.path.exists(self.pointer_file):
+            return None
+        with open(self.pointer_file, 'r') as file:
+            generation_id = file.read().strip()
+        return generation_id or None
+
+
+    def get_active_dir(self) -> str:
+        """
+            Returns the chromadb directory that serves queries.
+
+            Falls back to the chromadb directory itself for knowledge bases built before generations were introduced.
+        """
+        generation_id = self.get_active_generation()
+        if generation_id is None:
+            return self.root_dir
+        return self.generation_path(generation_id)
+
+
+    def get_active_metadata(self) -> dict:
+        """
+            Returns the metadata of the active generation, or an empty dict if nothing has been promoted yet.
+        """
+        generation_id = self.get_active_generation()
+        return self.read_metadata(generation_id) if generation_id else {}
+
+
+    def create_staging(self) -> str:
+        """
+            Creates a new (not yet visible) generation directory for a build.
+
+            Returns:
+                str: The id of the new generation.
+
+            Raises:
+                Exception: If an error occurs while creating the directory.
+        """
+        try:
+            generation_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+            create_dir(dirs=[self.generation_path(generation_id)]) # create the staging directory
+            self.update_metadata(generation_id, status="staging", created_at=time.time())
+            log(file_object=self.log_file, log_message=f"created staging generation '{generation_id}' under '{self.generations_dir}'") # logs the message
+
+            return generation_id
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def promote(self, generation_id:str) -> None:
+        """
+            Makes the given (validated) generation the active one by atomically swapping the pointer file.
+
+            Readers that already opened the previous generation keep using it; it is only removed by `cleanup` once the
+            grace period has passed.
+
+            Args:
+                generation_id (str): The id of the generation to be promoted.
+
+            Raises:
+                Exception: If an error occurs during the promotion.
+        """
+        try:
+            previous_id = self.get_active_generation()
+            self.update_metadata(generation_id, status="active", promoted_at=time.time())
+
+            tmp_pointer = f"{self.pointer_file}.tmp"
+            with open(tmp_pointer, 'w') as file:
+                file.write(generation_id)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_pointer, self.pointer_file) # atomic swap, queries now see the new generation
+
+            if previous_id and previous_id != generation_id and os.path.isdir(self.generation_path(previous_id)):
+                self.update_metadata(previous_id, status="retired", retired_at=time.time())
+            log(file_object=self.log_file, log_message=f"promoted generation '{generation_id}' (previous: '{previous_id}')") # logs the message
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def discard(self, generation_id:str) -> None:
+        """
+            Removes a generation that failed to build or validate. The active generation is never removed.
+        """
+        if generation_id == self.get_active_generation():
+            return
+        release_chromadb(self.generation_path(generation_id))
+        clean_prev_dirs_if_exis(dir_path=self.generation_path(generation_id))
+        log(file_object=self.log_file, log_message=f"discarded generation '{generation_id}'") # logs the message
+
+
+    def cleanup(self, keep:list=None, retired_only:bool=False) -> list:
+        """
+            Garbage-collects old generations: retired generations whose grace period has expired, and abandoned staging or
+            failed builds older than the grace period. The active generation and the ids in `keep` are never removed.
+
+            Args:
+                keep (list): Generation ids that must be kept (e.g. a staging build that is still being resumed).
+                retired_only (bool): Only collect retired generations, never staging builds (used outside of a build,
+                                     where a build may be running in another process).
+
+            Returns:
+                list: The ids of the removed generations.
+
+            Raises:
+                Exception: If an error occurs while removing a generation.
+        """
+        try:
+            removed = []
+            if not os.path.isdir(self.generations_dir):
+                return removed
+
+            protected = set(keep or [])
+            protected.add(self.get_active_generation())
+            now = time.time()
+
+            for generation_id in sorted(os.listdir(self.generations_dir)):
+                if generation_id in protected:
+                    continue
+                metadata = self.read_metadata(generation_id)
+                if retired_only and metadata.get("status") != "retired":
+                    continue
+                since = metadata.get("retired_at") or metadata.get("created_at") or os.path.getmtime(self.generation_path(generation_id))
+                if now - since < self.config.grace_period:
+                    continue # readers may still hold this generation
+
+                release_chromadb(self.generation_path(generation_id))
+                clean_prev_dirs_if_exis(dir_path=self.generation_path(generation_id))
+                removed.append(generation_id)
+
+            if removed:
+                log(file_object=self.log_file, log_message=f"garbage-collected generations {removed}") # logs the message
+            return removed
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
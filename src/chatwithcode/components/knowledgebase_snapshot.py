@@ -0,0 +1,234 @@
+from chatwithcode.utils.common_utils import log, create_dir, clean_prev_dirs_if_exis, read_json_file, write_json_file_atomic
+from chatwithcode.entity.config_entity import KnowledgeBaseSnapshotConfig, StoreEmbeddingVectorDBConfig
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from chatwithcode.components.symbol_index import SymbolIndex
+from chatwithcode.components.repo_summaries import RepoSummarizer
+from chatwithcode.components.path_scope import PATHS_FILE
+from langchain_chroma import Chroma
+from numpy.lib.format import open_memmap
+import numpy as np
+import hashlib
+import shutil
+import json
+import time
+import os
+
+
+class KnowledgeBaseSnapshot:
+    """
+        The KnowledgeBaseSnapshot class exports the active knowledge base into a portable, versioned snapshot and imports a
+        snapshot as a new knowledge-base generation, so indexing nodes build once and API nodes only load the result.
+
+        A snapshot is a directory containing:
+            manifest.json  -> format version, embedding model, source (url & commit), counts and sha256 of every file
+            vectors.npy    -> float32 matrix (chunks x dim), memory-mapped on load without a copy
+            chunks.jsonl   -> one line per chunk with its id, text and metadata, in the same order as the vectors
+            symbols.json   -> the symbol index of the generation, if it has one
+            summaries.json -> the file, package & repo summaries of the generation, if it has them
+            paths.json     -> the indexed paths, used to scope queries to globs
+    """
+    FORMAT_VERSION = 1
+    MANIFEST_FILE = "manifest.json"
+    VECTORS_FILE = "vectors.npy"
+    CHUNKS_FILE = "chunks.jsonl"
+    ARTIFACT_FILES = (SymbolIndex.SYMBOLS_FILE, RepoSummarizer.SUMMARIES_FILE, PATHS_FILE) # generation files shipped as they are
+
+    def __init__(self, config: KnowledgeBaseSnapshotConfig, vectordb_config: StoreEmbeddingVectorDBConfig) -> None:
+        self.config = config
+        self.vectordb_config = vectordb_config
+        self.log_file = "logs/logs.log"
+        self.generations = KnowledgeBaseGenerations(config=self.vectordb_config)
+
+
+    @staticmethod
+    def file_sha256(file_path:str) -> str:
+        """
+            Returns the sha256 of a file, read in 1 MB blocks.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def export_snapshot(self) -> str:
+        """
+            Export the active knowledge base into a snapshot directory under `snapshots_dir`.
+
+            Returns:
+                str: The path of the snapshot.
+
+            Raises:
+                Exception: If there is no knowledge base or an error occurs during the export.
+        """
+        try:
+            generation_id = self.generations.get_active_generation()
+            if generation_id is None:
+                raise ValueError(f"no active knowledgebase generation under '{self.vectordb_config.chromadb_dir}'")
+            generation_dir = self.generations.generation_path(generation_id) # pinned, a promotion during the export doesn't mix generations
+            metadata = self.generations.read_metadata(generation_id)
+            source = metadata.get("source", {})
+
+            collection = Chroma(persist_directory=generation_dir)._collection
+            count = collection.count()
+            first = collection.get(include=["embeddings"], limit=1)
+            if count == 0 or not first["embeddings"]:
+                raise ValueError(f"the active knowledgebase '{generation_id}' is empty")
+            dim = len(first["embeddings"][0])
+
+            repo_name = os.path.basename(str(source.get("url", "knowledgebase")).rstrip("/")).replace(".git", "") or "knowledgebase"
+            snapshot_name = f"{repo_name}-{str(source.get('commit', ''))[:12] or generation_id}-{generation_id}"
+            snapshot_dir = os.path.join(self.config.snapshots_dir, snapshot_name)
+            tmp_dir = f"{snapshot_dir}.tmp"
+            clean_prev_dirs_if_exis(dir_path=tmp_dir)
+            create_dir(dirs=[tmp_dir])
+
+            # write vectors & chunks batch by batch, the vectors go straight into a memory-mapped .npy file:
+            vectors = open_memmap(os.path.join(tmp_dir, self.VECTORS_FILE), mode="w+", dtype=np.float32, shape=(count, dim))
+            with open(os.path.join(tmp_dir, self.CHUNKS_FILE), 'w', encoding="utf-8") as chunks_file:
+                for offset in range(0, count, self.config.batch_size):
+                    batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=self.config.batch_size, offset=offset)
+                    vectors[offset:offset + len(batch["ids"])] = np.asarray(batch["embeddings"], dtype=np.float32)
+                    for chunk_id, text, chunk_metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                        chunks_file.write(json.dumps({"id": chunk_id, "text": text, "metadata": chunk_metadata}) + "\n")
+            vectors.flush()
+            del vectors
+
+            for name in self.ARTIFACT_FILES:
+                if os.path.exists(os.path.join(generation_dir, name)):
+                    shutil.copyfile(os.path.join(generation_dir, name), os.path.join(tmp_dir, name))
+
+            files = {name: {"sha256": self.file_sha256(os.path.join(tmp_dir, name)), "bytes": os.path.getsize(os.path.join(tmp_dir, name))}
+                     for name in sorted(os.listdir(tmp_dir))}
+            manifest = {
+                "format_version": self.FORMAT_VERSION,
+                "created_at": time.time(),
+                "embedding_model": self.vectordb_config.embedding_model_name,
+                "source": source,
+                "generation_id": generation_id,
+                "chunks": count,
+                "dim": dim,
+                "dtype": "float32",
+                "files": files
+            }
+            write_json_file_atomic(file_path=os.path.join(tmp_dir, self.MANIFEST_FILE), data=manifest)
+
+            clean_prev_dirs_if_exis(dir_path=snapshot_dir)
+            os.replace(tmp_dir, snapshot_dir) # the snapshot only appears once it is complete
+            log(file_object=self.log_file, log_message=f"exported knowledgebase '{generation_id}' ({count} chunks) to snapshot '{snapshot_dir}'") # logs the message
+
+            return snapshot_dir
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def verify_snapshot(self, snapshot_dir:str) -> dict:
+        """
+            Verifies the format version, the embedding model and the checksum of every file of a snapshot.
+
+            Args:
+                snapshot_dir (str): The path of the snapshot.
+
+            Returns:
+                dict: The manifest of the snapshot.
+
+            Raises:
+                ValueError: If the snapshot is incompatible or corrupted.
+        """
+        manifest = read_json_file(file_path=os.path.join(snapshot_dir, self.MANIFEST_FILE))
+        if manifest is None:
+            raise ValueError(f"'{snapshot_dir}' is not a knowledgebase snapshot, '{self.MANIFEST_FILE}' is missing")
+        if manifest.get("format_version") != self.FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format version '{manifest.get('format_version')}', expected '{self.FORMAT_VERSION}'")
+        if manifest.get("embedding_model") != self.config.embedding_model_name:
+            raise ValueError(f"snapshot was built with '{manifest.get('embedding_model')}', but the configured embedding model is '{self.config.embedding_model_name}'")
+
+        for name, expected in manifest["files"].items():
+            file_path = os.path.join(snapshot_dir, name)
+            if not os.path.exists(file_path) or self.file_sha256(file_path) != expected["sha256"]:
+                raise ValueError(f"snapshot file '{name}' is missing or its checksum does not match")
+
+        return manifest
+
+
+    def import_snapshot(self, snapshot_dir:str) -> str:
+        """
+            Import a snapshot as a new knowledge-base generation and promote it, without re-embedding anything.
+
+            Args:
+                snapshot_dir (str): The path of the snapshot.
+
+            Returns:
+                str: The id of the promoted generation.
+
+            Raises:
+                Exception: If the snapshot is invalid or an error occurs during the import.
+        """
+        try:
+            manifest = self.verify_snapshot(snapshot_dir=snapshot_dir)
+            vectors = np.load(os.path.join(snapshot_dir, self.VECTORS_FILE), mmap_mode="r") # memory-mapped, no copy
+            if vectors.shape != (manifest["chunks"], manifest["dim"]):
+                raise ValueError(f"snapshot vectors have shape '{vectors.shape}', manifest says '({manifest['chunks']}, {manifest['dim']})'")
+
+            emb = StoreEmbeddings(config=self.vectordb_config)
+            generation_id = self.generations.create_staging()
+            try:
+                vectordb = Chroma(persist_directory=self.generations.generation_path(generation_id), embedding_function=emb.load_embedding_model())
+                with open(os.path.join(snapshot_dir, self.CHUNKS_FILE), 'r', encoding="utf-8") as chunks_file:
+                    offset, batch = 0, []
+                    for line in chunks_file:
+                        batch.append(json.loads(line))
+                        if len(batch) == self.config.batch_size:
+                            self._add_batch(vectordb=vectordb, vectors=vectors, offset=offset, batch=batch)
+                            offset, batch = offset + len(batch), []
+                    if batch:
+                        self._add_batch(vectordb=vectordb, vectors=vectors, offset=offset, batch=batch)
+
+                emb.validate_knowledgebase(vectordb=vectordb, expected_chunks=manifest["chunks"])
+                for name in self.ARTIFACT_FILES:
+                    if name in manifest["files"]:
+                        shutil.copyfile(os.path.join(snapshot_dir, name), os.path.join(self.generations.generation_path(generation_id), name))
+
+            except Exception:
+                self.generations.discard(generation_id)
+                raise
+
+            self.generations.update_metadata(generation_id, source=manifest.get("source", {}), chunks=manifest["chunks"],
+                                             snapshot=os.path.basename(os.path.normpath(snapshot_dir)))
+            self.generations.promote(generation_id)
+            self.generations.cleanup()
+            log(file_object=self.log_file, log_message=f"imported snapshot '{snapshot_dir}' as generation '{generation_id}'") # logs the message
+
+            return generation_id
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    @staticmethod
+    def _add_batch(vectordb:Chroma, vectors:np.ndarray, offset:int, batch:list) -> None:
+        """
+            Adds a batch of snapshot chunks with their precomputed vectors to the Chroma collection.
+        """
+        vectordb._collection.upsert(
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=vectors[offset:offset + len(batch)].tolist(),
+            documents=[chunk["text"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch]
+        )
+
+
+
+if __name__ == "__main__":
+    from chatwithcode.config.configuration import ConfigManager
+    config_manager = ConfigManager()
+
+    snapshot = KnowledgeBaseSnapshot(config=config_manager.get_knowledgebase_snapshot_config(),
+                                     vectordb_config=config_manager.get_store_embedding_vectordb_config())
+    snapshot_dir = snapshot.export_snapshot()
+    print(snapshot.import_snapshot(snapshot_dir=snapshot_dir))
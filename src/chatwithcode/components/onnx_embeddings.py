@@ -0,0 +1,318 @@
+from chatwithcode.utils.common_utils import log, create_dir, read_json_file, write_json_file_atomic, get_memory_usage_mb
+from chatwithcode.entity.config_entity import OnnxEmbeddingConfig
+from langchain_core.embeddings import Embeddings
+from contextlib import contextmanager
+from typing import List
+import numpy as np
+import hashlib
+import fcntl
+import time
+import os
+
+
+# sentences used to verify that the onnx vectors agree with the torch vectors before the backend is enabled:
+PARITY_TEXTS = [
+    "what is DataIngestion?",
+    "def get_data(self, url: str) -> None: Repo.clone_from(url=url, to_path=self.config.github_dir)",
+    "class StoreEmbeddings: loads an embedding model and stores the chunks into chromadb",
+    "Retrieves the top k results from a Chroma database using the specified embedding model.",
+    "explain the code?",
+    "import os\nfrom pathlib import Path\n\nPARAMS_FILE_PATH = Path('params.yaml')",
+    "@app.route('/ask', methods=['POST'])\ndef generate_response():\n    data = request.get_json()",
+    "How are the answers stored in the chat history json file?",
+]
+
+
+@contextmanager
+def file_lock(path:str):
+    """
+        Holds an exclusive lock on `path` (created if needed), so a single process at a time prepares a shared cache directory.
+    """
+    with open(path, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def file_sha256(file_path:str) -> str:
+    """
+        Returns the sha256 of a file, read in 1 MB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+        Sentence embeddings computed with onnxruntime on CPU (mean pooling + L2 normalization, like sentence-transformers),
+        without loading the torch runtime.
+    """
+    def __init__(self, model_path:str, tokenizer_path:str, num_threads:int, max_length:int, batch_size:int) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+
+    def _encode(self, texts:List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None) # mean pooling
+        return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None) # normalize
+
+
+    def embed_documents(self, texts:List[str]) -> List[List[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = [self._encode(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+
+    def embed_query(self, text:str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class OnnxEmbeddingBackend:
+    """
+        The OnnxEmbeddingBackend class runs the configured sentence-transformers model exported to ONNX (optionally with dynamic
+        int8 quantization). Exporting and checking the parity with the torch vectors (cosine similarity >= `parity_threshold`)
+        is an explicit offline step, `prepare` (python -m chatwithcode.components.onnx_embeddings); serving only `load`s an
+        export that passed the check and never imports torch.
+
+        Every file is written to a temporary file and moved into place with os.replace, under a lock on the cache directory,
+        so concurrent workers never read a half-written model.
+
+        Layout of the cache directory:
+            <cache_dir>/<model>/model.onnx       -> fp32 export
+            <cache_dir>/<model>/model.int8.onnx  -> dynamically quantized export
+            <cache_dir>/<model>/tokenizer.json   -> fast tokenizer
+            <cache_dir>/<model>/parity.json      -> parity check result per exported model file (with its sha256)
+            <cache_dir>/<model>/.lock            -> lock held while preparing
+    """
+    PARITY_FILE = "parity.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, config: OnnxEmbeddingConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.model_dir = os.path.join(str(self.config.cache_dir), self.config.model_name.replace("/", "__"))
+        self.model_file = "model.int8.onnx" if self.config.quantize else "model.onnx"
+        self.model_path = os.path.join(self.model_dir, self.model_file)
+        self.tokenizer_path = os.path.join(self.model_dir, "tokenizer.json")
+
+
+    def num_threads(self) -> int:
+        """
+            Returns the configured thread count, or the number of physical cores (approximated as half of the logical ones) for 0.
+        """
+        return self.config.num_threads or max(1, (os.cpu_count() or 2) // 2)
+
+
+    def export(self) -> str:
+        """
+            Export (and quantize) the model to ONNX unless it is already cached. Only this step needs torch & transformers;
+            it must run under the lock of the cache directory (see `prepare`).
+
+            Returns:
+                str: The path of the ONNX model used by the backend.
+
+            Raises:
+                Exception: If an error occurs during the export.
+        """
+        try:
+            if os.path.exists(self.model_path) and os.path.exists(self.tokenizer_path):
+                return self.model_path
+
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            create_dir(dirs=[self.model_dir])
+            fp32_path = os.path.join(self.model_dir, "model.onnx")
+            tokenizer = AutoTokenizer.from_pretrained(self.config.model_name)
+            if not os.path.exists(self.tokenizer_path):
+                tokenizer.backend_tokenizer.save(f"{self.tokenizer_path}.tmp")
+                os.replace(f"{self.tokenizer_path}.tmp", self.tokenizer_path)
+
+            if not os.path.exists(fp32_path):
+                model = AutoModel.from_pretrained(self.config.model_name).eval()
+                sample = tokenizer(["export the model"], return_tensors="pt")
+                torch.onnx.export(model, (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]), f"{fp32_path}.tmp",
+                                  input_names=["input_ids", "attention_mask", "token_type_ids"],
+                                  output_names=["last_hidden_state"],
+                                  dynamic_axes={name: {0: "batch", 1: "sequence"} for name in ["input_ids", "attention_mask", "token_type_ids", "last_hidden_state"]},
+                                  opset_version=14)
+                os.replace(f"{fp32_path}.tmp", fp32_path)
+                log(file_object=self.log_file, log_message=f"exported '{self.config.model_name}' to onnx '{fp32_path}'") # logs the message
+
+            if self.config.quantize and not os.path.exists(self.model_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(fp32_path, f"{self.model_path}.tmp", weight_type=QuantType.QInt8)
+                os.replace(f"{self.model_path}.tmp", self.model_path)
+                log(file_object=self.log_file, log_message=f"quantized '{fp32_path}' to int8 '{self.model_path}'") # logs the message
+
+            return self.model_path
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def create_embeddings(self) -> OnnxEmbeddings:
+        """
+            Returns the onnxruntime embeddings of the exported model.
+        """
+        return OnnxEmbeddings(model_path=self.model_path, tokenizer_path=self.tokenizer_path, num_threads=self.num_threads(),
+                              max_length=self.config.max_length, batch_size=self.config.batch_size)
+
+
+    def check_parity(self, reference:Embeddings) -> dict:
+        """
+            Compares the onnx vectors with the vectors of the reference (torch) embeddings and records the result, together with
+            the sha256 of the checked model file.
+
+            Args:
+                reference (Embeddings): The torch embeddings the knowledge base was built with.
+
+            Returns:
+                dict: {"model_file", "sha256", "min_cosine", "mean_cosine", "threshold", "passed"}
+        """
+        onnx_vectors = np.array(self.create_embeddings().embed_documents(PARITY_TEXTS))
+        torch_vectors = np.array(reference.embed_documents(PARITY_TEXTS))
+        cosine = (onnx_vectors * torch_vectors).sum(axis=1) / (np.linalg.norm(onnx_vectors, axis=1) * np.linalg.norm(torch_vectors, axis=1))
+
+        result = {
+            "model_file": self.model_file,
+            "sha256": file_sha256(self.model_path),
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+            "threshold": self.config.parity_threshold,
+            "passed": bool(cosine.min() >= self.config.parity_threshold)
+        }
+        parity = read_json_file(file_path=os.path.join(self.model_dir, self.PARITY_FILE), default={})
+        parity[self.model_file] = result
+        write_json_file_atomic(file_path=os.path.join(self.model_dir, self.PARITY_FILE), data=parity)
+        log(file_object=self.log_file, log_message=f"onnx parity check of '{self.model_path}': min cosine '{result['min_cosine']:.5f}', passed '{result['passed']}'") # logs the message
+
+        return result
+
+
+    def prepare(self, reference_factory) -> dict:
+        """
+            Offline step: export the model and check its parity with the torch vectors, unless an up to date check exists.
+            Concurrent calls wait for each other on the lock of the cache directory.
+
+            Args:
+                reference_factory (callable): Returns the torch embeddings, only called when the parity has to be checked.
+
+            Returns:
+                dict: The parity check result (see `check_parity`).
+        """
+        create_dir(dirs=[self.model_dir])
+        with file_lock(os.path.join(self.model_dir, self.LOCK_FILE)):
+            self.export()
+            parity = self.parity()
+            if parity is None:
+                parity = self.check_parity(reference=reference_factory())
+            return parity
+
+
+    def parity(self) -> dict:
+        """
+            Returns the parity check result of the exported model, or None if there is no export, it has not been checked with
+            the configured threshold, or the model file changed since it was checked.
+        """
+        if not (os.path.exists(self.model_path) and os.path.exists(self.tokenizer_path)):
+            return None
+        parity = read_json_file(file_path=os.path.join(self.model_dir, self.PARITY_FILE), default={}).get(self.model_file)
+        if parity is None or parity.get("threshold") != self.config.parity_threshold or parity.get("sha256") != file_sha256(self.model_path):
+            return None
+        return parity
+
+
+    def load(self) -> OnnxEmbeddings:
+        """
+            Returns the onnx embeddings if the exported model passed the parity check (see `prepare`). Never exports the model
+            nor imports torch.
+
+            Returns:
+                OnnxEmbeddings: The embeddings, or None if there is no export that passed the parity check.
+        """
+        parity = self.parity()
+        if parity is None or not parity["passed"]:
+            log(file_object=self.log_file, log_message=f"no onnx export of '{self.config.model_name}' passed the parity check, prepare it with `python -m chatwithcode.components.onnx_embeddings`") # logs the message
+            return None
+        return self.create_embeddings()
+
+
+def benchmark(backends:dict, texts:List[str], repeat:int=3) -> dict:
+    """
+        Measures the throughput and the memory of embedding backends.
+
+        Args:
+            backends (dict): {name: callable returning the embeddings}, each backend is loaded in turn.
+            texts (list): The texts to embed.
+            repeat (int): The number of timed runs, the best one is reported.
+
+        Returns:
+            dict: {name: {"load_seconds", "texts_per_second", "rss_delta_mb"}}
+    """
+    results = {}
+    for name, factory in backends.items():
+        rss_before = get_memory_usage_mb()
+        start = time.perf_counter()
+        embeddings = factory()
+        load_seconds = time.perf_counter() - start
+        embeddings.embed_documents(texts[:8]) # warm up
+
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            embeddings.embed_documents(texts)
+            best = min(best, time.perf_counter() - start)
+
+        results[name] = {
+            "load_seconds": round(load_seconds, 3),
+            "texts_per_second": round(len(texts) / best, 1),
+            "rss_delta_mb": round(get_memory_usage_mb() - rss_before, 1)
+        }
+    return results
+
+
+
+if __name__ == "__main__":
+    from chatwithcode.config.configuration import ConfigManager
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    config_manager = ConfigManager()
+    onnx_config = config_manager.get_store_embedding_vectordb_config().onnx_config
+
+    # export & parity check (the offline step serving relies on), then the benchmark:
+    backend = OnnxEmbeddingBackend(config=onnx_config)
+    print(backend.prepare(reference_factory=lambda: HuggingFaceEmbeddings(model_name=onnx_config.model_name)))
+    texts = PARITY_TEXTS * 32
+    # onnx first: the torch run would otherwise inflate the rss baseline of the onnx run.
+    print(benchmark(backends={
+        "onnx": backend.create_embeddings,
+        "torch": lambda: HuggingFaceEmbeddings(model_name=onnx_config.model_name),
+    }, texts=texts))
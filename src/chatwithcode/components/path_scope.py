@@ -0,0 +1,119 @@
+from typing import List
+import fnmatch
+import os
+
+
+PATHS_FILE = "paths.json" # sorted paths of the indexed files, stored in every knowledge-base generation
+MAX_DIR_DEPTH = 8 # directory prefixes stored in the chunk metadata (dir_1 ... dir_8)
+GLOB_CHARACTERS = "*?["
+
+
+def path_metadata(path:str) -> dict:
+    """
+        Returns the metadata used to scope queries to a file, a directory or a glob, for a path relative to the repository:
+            path       -> "src/chatwithcode/components/data_ingestion.py"
+            file_type  -> ".py"
+            dir_1      -> "src"
+            dir_2      -> "src/chatwithcode"
+            dir_3      -> "src/chatwithcode/components"
+
+        Chroma indexes the metadata, so a directory scope is a single equality filter on `dir_<depth>` inside the vector search.
+    """
+    path = path.replace(os.sep, "/")
+    metadata = {"path": path, "file_type": os.path.splitext(path)[1].lower()}
+    parts = path.split("/")[:-1]
+    for depth in range(1, min(len(parts), MAX_DIR_DEPTH) + 1):
+        metadata[f"dir_{depth}"] = "/".join(parts[:depth])
+    return metadata
+
+
+class PathScope:
+    """
+        Turns the path prefixes and globs of a query into a Chroma `where` filter, applied inside the vector search:
+            a known file                           -> {"path": {"$eq": file}}
+            a directory (up to MAX_DIR_DEPTH deep) -> {"dir_<depth>": {"$eq": directory}}
+            a glob                                 -> the narrowest of {"file_type": ...}, {"dir_<depth>": ...} or both that
+                                                      selects exactly the matching files (e.g. "*.py", "tests/*")
+            any other glob, or a deeper directory  -> {"path": {"$in": matching files of paths.json}}
+        When the patterns select every indexed file, there is no filter at all (`where` is None).
+        A pattern that selects no indexed file raises a ValueError.
+    """
+    def __init__(self, patterns:List[str], known_paths:List[str]) -> None:
+        self.patterns = [self.normalize(pattern) for pattern in patterns if self.normalize(pattern)]
+        self.known_paths = known_paths
+        self.known = set(known_paths)
+        if not self.patterns:
+            raise ValueError("no path prefix or glob given")
+
+        selections = [self._select(pattern) for pattern in self.patterns]
+        if set().union(*selections) >= self.known:
+            self.where = None # the whole repository, a filter would only slow the search down
+        else:
+            filters = [self._filter(pattern, selected) for pattern, selected in zip(self.patterns, selections)]
+            self.where = filters[0] if len(filters) == 1 else {"$or": filters}
+
+
+    @staticmethod
+    def normalize(pattern:str) -> str:
+        pattern = pattern.strip().replace("\\", "/")
+        while pattern.startswith("./"):
+            pattern = pattern[2:]
+        return pattern.strip("/")
+
+
+    def _select(self, pattern:str) -> set:
+        """
+            Returns the indexed files selected by a pattern.
+        """
+        if pattern in self.known:
+            return {pattern}
+        if not any(character in pattern for character in GLOB_CHARACTERS):
+            selected = {path for path in self.known_paths if path.startswith(pattern + "/")}
+            if not selected:
+                raise ValueError(f"no indexed file under '{pattern}'")
+            return selected
+        selected = {path for path in self.known_paths if fnmatch.fnmatchcase(path, pattern)}
+        if not selected:
+            raise ValueError(f"no indexed file matches '{pattern}'")
+        return selected
+
+
+    def _filter(self, pattern:str, selected:set) -> dict:
+        if pattern in self.known:
+            return {"path": {"$eq": pattern}}
+
+        depth = pattern.count("/") + 1
+        if not any(character in pattern for character in GLOB_CHARACTERS):
+            if depth <= MAX_DIR_DEPTH:
+                return {f"dir_{depth}": {"$eq": pattern}}
+            return {"path": {"$in": sorted(selected)}}
+
+        # a glob: prefer the indexed file_type / dir_<depth> metadata over listing the files
+        file_types = sorted({path_metadata(path)["file_type"] for path in selected})
+        by_type = {path for path in self.known_paths if path_metadata(path)["file_type"] in file_types}
+        type_filter = {"file_type": {"$eq": file_types[0]} if len(file_types) == 1 else {"$in": file_types}}
+        if by_type == selected:
+            return type_filter
+
+        common = os.path.commonprefix([path.split("/")[:-1] for path in selected])[:MAX_DIR_DEPTH]
+        if common:
+            directory = "/".join(common)
+            by_dir = {path for path in self.known_paths if path.startswith(directory + "/")}
+            dir_filter = {f"dir_{directory.count('/') + 1}": {"$eq": directory}}
+            if by_dir == selected:
+                return dir_filter
+            if by_dir & by_type == selected:
+                return {"$and": [dir_filter, type_filter]}
+        return {"path": {"$in": sorted(selected)}}
+
+
+    def matches(self, path:str) -> bool:
+        """
+            Returns True if a path relative to the repository is within the scope.
+        """
+        if path is None:
+            return False
+        for pattern in self.patterns:
+            if path == pattern or path.startswith(pattern + "/") or fnmatch.fnmatchcase(path, pattern):
+                return True
+        return False
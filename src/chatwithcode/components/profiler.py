@@ -0,0 +1,285 @@
+from chatwithcode.utils.common_utils import log, create_dir
+from chatwithcode.entity.config_entity import ProfilingConfig
+from collections import Counter, OrderedDict
+from datetime import datetime
+import threading
+import tracemalloc
+import time
+import sys
+import os
+
+
+# tracemalloc is process-wide: the admin MemoryProfiler and the per-request sessions share it, it is stopped by the last user
+# that needs it, and never if it was started by someone else (e.g. PYTHONTRACEMALLOC).
+_TRACING = {"users": 0, "started": False}
+_TRACING_LOCK = threading.Lock()
+
+
+def acquire_tracing(frames:int) -> None:
+    """
+        Registers a user of tracemalloc, starting it (with `frames` frames per allocation) if it is not tracing yet.
+    """
+    with _TRACING_LOCK:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _TRACING["started"] = True
+        _TRACING["users"] += 1
+
+
+def release_tracing() -> bool:
+    """
+        Unregisters a user of tracemalloc, stopping it if it was the last one and tracing was started by `acquire_tracing`.
+
+        Returns:
+            bool: Whether tracemalloc is still tracing.
+    """
+    with _TRACING_LOCK:
+        _TRACING["users"] = max(_TRACING["users"] - 1, 0)
+        if _TRACING["users"] == 0 and _TRACING["started"]:
+            tracemalloc.stop()
+            _TRACING["started"] = False
+        return tracemalloc.is_tracing()
+
+
+def format_frame(frame) -> str:
+    """
+        Returns a frame as a flamegraph node: "function (file:line)", without the ';' separator of the collapsed stacks.
+    """
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """
+        The SamplingProfiler class is a low-overhead statistical CPU profiler: a background thread reads the stacks of the other
+        threads every `sample_interval` seconds (sys._current_frames) and counts them. The result is in the collapsed-stack
+        format ("root;caller;callee count" per line) read by flamegraph.pl, speedscope & co.
+
+        A run is bounded by `seconds`, by `requests` (counted through `request_finished`) and always by `max_seconds`.
+        With `thread_ids`, only those threads are sampled (e.g. the thread serving one request).
+    """
+    def __init__(self, config: ProfilingConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread_ids = None
+        self.deadline = None
+        self.requests_left = None
+        self.started_at = None
+        self.stopped_at = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self, seconds:float=None, requests:int=None, thread_ids:set=None) -> "SamplingProfiler":
+        """
+            Start sampling, discarding the result of the previous run.
+
+            Args:
+                seconds (float): Stop after this many seconds (capped at `max_seconds`).
+                requests (int): Stop after this many finished requests.
+                thread_ids (set): Only sample these threads, None for all threads.
+
+            Returns:
+                SamplingProfiler: The instance itself.
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("the CPU profiler is already running")
+            seconds = min(seconds or self.config.max_seconds, self.config.max_seconds)
+            self.stacks = Counter()
+            self.samples = 0
+            self.thread_ids = set(thread_ids) if thread_ids else None
+            self.requests_left = requests
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.deadline = self.started_at + seconds
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._sample, name="cpu-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.config.sample_interval) and time.time() < self.deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.config.max_stack_depth:
+                    stack.append(format_frame(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+
+    def request_finished(self) -> None:
+        """
+            Counts a finished request, stops the profiler after the requested number of requests.
+        """
+        if self.requests_left is None or not self.running:
+            return
+        with self._lock:
+            self.requests_left -= 1
+            if self.requests_left <= 0:
+                self._stop_event.set()
+
+
+    def stop(self) -> str:
+        """
+            Stop sampling (if running) and return the collapsed stacks.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        log(file_object=self.log_file, log_message=f"CPU profile: '{self.samples}' samples, '{len(self.stacks)}' distinct stacks") # logs the message
+        return self.collapsed()
+
+
+    def collapsed(self) -> str:
+        """
+            Returns the stacks sampled so far in the collapsed-stack (flamegraph) format, the hottest first.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "requests_left": self.requests_left,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at
+        }
+
+
+class MemoryProfiler:
+    """
+        The MemoryProfiler class takes tracemalloc snapshots and diffs them, to find what keeps growing across requests
+        (e.g. leaked log handlers or models loaded again and again). Tracing only runs between the first snapshot and `stop`
+        (unless a profiling session still needs it), at most `max_snapshots` snapshots are kept in memory.
+    """
+    def __init__(self, config: ProfilingConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.snapshots = OrderedDict()
+        self.tracing = False
+        self._lock = threading.Lock()
+
+
+    def snapshot(self, label:str=None) -> dict:
+        """
+            Take a snapshot (starting tracemalloc if needed) and keep it under `label`.
+
+            Returns:
+                dict: The label, the traced memory and the top allocation sites of the snapshot.
+        """
+        with self._lock:
+            if not self.tracing:
+                acquire_tracing(frames=self.config.memory_frames)
+                self.tracing = True
+            label = label or datetime.now().strftime("%Y%m%d%H%M%S%f")
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+            ))
+            self.snapshots[label] = snapshot
+            self.snapshots.move_to_end(label)
+            while len(self.snapshots) > self.config.max_snapshots:
+                self.snapshots.popitem(last=False)
+
+            current, peak = tracemalloc.get_traced_memory()
+            log(file_object=self.log_file, log_message=f"memory snapshot '{label}': traced {current / 1024 / 1024:.1f} MB (peak {peak / 1024 / 1024:.1f} MB)") # logs the message
+            return {
+                "label": label,
+                "traced_mb": round(current / 1024 / 1024, 2),
+                "peak_mb": round(peak / 1024 / 1024, 2),
+                "top": [str(stat) for stat in snapshot.statistics("lineno")[:self.config.top_stats]]
+            }
+
+
+    def diff(self, base:str=None, current:str=None) -> list:
+        """
+            Compare two snapshots (by default the two latest) and return the allocation sites that grew the most.
+        """
+        labels = list(self.snapshots)
+        base = base or (labels[-2] if len(labels) > 1 else None)
+        current = current or (labels[-1] if labels else None)
+        if base not in self.snapshots or current not in self.snapshots:
+            raise KeyError(f"unknown snapshots '{base}', '{current}', available: {labels}")
+
+        stats = self.snapshots[current].compare_to(self.snapshots[base], "traceback" if self.config.memory_frames > 1 else "lineno")
+        return [{
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+            "traceback": stat.traceback.format()
+        } for stat in stats[:self.config.top_stats]]
+
+
+    def stop(self) -> bool:
+        """
+            Drop the snapshots and stop tracing, unless a profiling session still needs it.
+
+            Returns:
+                bool: Whether tracemalloc is still tracing.
+        """
+        with self._lock:
+            self.snapshots.clear()
+            if self.tracing:
+                self.tracing = False
+                return release_tracing()
+            return tracemalloc.is_tracing()
+
+
+class ProfilingSession:
+    """
+        The ProfilingSession class profiles a single request that opted in via the profiling header: 'cpu' samples only the
+        thread serving the request, 'memory' diffs a tracemalloc snapshot taken before and after it. The result is written to
+        the profiles directory, under the name returned by `finish`.
+    """
+    def __init__(self, config: ProfilingConfig, kinds:set) -> None:
+        self.config = config
+        self.kinds = kinds
+        self.name = f"request-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        self.cpu = None
+        self.memory = None
+
+    def start(self) -> "ProfilingSession":
+        if "cpu" in self.kinds:
+            self.cpu = SamplingProfiler(config=self.config).start(thread_ids={threading.get_ident()})
+        if "memory" in self.kinds:
+            acquire_tracing(frames=self.config.memory_frames)
+            self.memory = tracemalloc.take_snapshot()
+        return self
+
+    def finish(self) -> list:
+        """
+            Stop profiling and write the results. Returns the names of the written files.
+        """
+        create_dir(dirs=[str(self.config.profiles_dir)])
+        written = []
+        if self.cpu is not None:
+            written.append(f"{self.name}.collapsed")
+            with open(os.path.join(str(self.config.profiles_dir), written[-1]), 'w') as file:
+                file.write(self.cpu.stop())
+        if self.memory is not None:
+            try:
+                stats = tracemalloc.take_snapshot().compare_to(self.memory, "lineno")[:self.config.top_stats]
+            finally:
+                release_tracing()
+                self.memory = None
+            written.append(f"{self.name}.memory.txt")
+            with open(os.path.join(str(self.config.profiles_dir), written[-1]), 'w') as file:
+                file.write("\n".join(str(stat) for stat in stats) + "\n")
+        return written
@@ -0,0 +1,152 @@
+from chatwithcode.utils.common_utils import log, create_dir, write_json_file_atomic
+from chatwithcode.entity.config_entity import RepoScanConfig
+import fnmatch
+import math
+import os
+import re
+
+
+# header comments of generated files (protobuf, grpc, thrift, swig, "Code generated ... DO NOT EDIT." of go-style tools, ...)
+GENERATED_HEADER_PATTERN = re.compile(
+    r"^[ \t]*(?:#|//|/\*|\*|--)[ \t]*(?:"
+    r"@generated\b"
+    r"|code generated\b.*\bdo not edit\b"
+    r"|generated by the protocol buffer compiler\b"
+    r"|(?:this file (?:is|was) )?(?:auto-?generated|automatically generated)\b"
+    r"|do not edit\b.*\bgenerated\b"
+    r")",
+    re.IGNORECASE | re.MULTILINE
+)
+GENERATED_HEADER_LINES = 10 # the header comment is searched in the first lines only
+
+
+class RepoBudgetExceeded(Exception):
+    """
+        Raised by the repo scan when a repository exceeds the ingestion budgets, before any embedding starts.
+    """
+
+
+class RepoScanner:
+    """
+        The RepoScanner class is a fast pre-scan of the cloned repository, run before the knowledge base is built:
+            - skips junk files: the configured ignore list (lockfiles, vendored & build directories, fixtures, ...) and,
+              by heuristics, generated, minified, binary or oversized files,
+            - reports the files, bytes, estimated chunks and estimated embedding time per directory,
+            - rejects the repository if it exceeds the budgets (max files, bytes, chunks).
+        Only the head of every file is read, nothing is parsed or embedded.
+    """
+    HEAD_BYTES = 8192
+
+    def __init__(self, config: RepoScanConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+
+
+    def is_ignored(self, path:str) -> bool:
+        """
+            Returns True if a path (relative to the repository) matches the ignore list, at any depth.
+        """
+        parts = path.split("/")
+        return any(fnmatch.fnmatchcase("/".join(parts[index:]), pattern)
+                   for pattern in self.config.ignore_patterns for index in range(len(parts)))
+
+
+    def skip_reason(self, file_path:str, size:int) -> str:
+        """
+            Returns why a file should not be ingested ('too large', 'binary', 'generated', 'minified'), or None.
+        """
+        if size > self.config.max_file_bytes:
+            return "too large"
+
+        with open(file_path, 'rb') as file:
+            head = file.read(self.HEAD_BYTES)
+        if b"\0" in head:
+            return "binary"
+
+        text = head.decode("utf-8", errors="ignore")
+        if GENERATED_HEADER_PATTERN.search("\n".join(text.splitlines()[:GENERATED_HEADER_LINES])):
+            return "generated"
+
+        lines = text.splitlines() or [""]
+        if max(len(line) for line in lines) > self.config.max_line_length or len(text) / len(lines) > self.config.max_avg_line_length:
+            return "minified"
+        return None
+
+
+    def estimate_chunks(self, size:int) -> int:
+        """
+            Returns the estimated number of chunks of a file of `size` bytes.
+        """
+        step = max(self.config.chunk_size - self.config.overlap, 1)
+        return max(1, math.ceil(max(size - self.config.overlap, 1) / step)) if size else 0
+
+
+    def scan(self) -> dict:
+        """
+            Scan the github directory, write the report and enforce the budgets.
+
+            Returns:
+                dict: The report: {"totals": {...}, "directories": {directory: {...}}, "skipped": {path: reason}}
+
+            Raises:
+                RepoBudgetExceeded: If the files to ingest exceed one of the budgets.
+                Exception: If an error occurs during the scan.
+        """
+        try:
+            github_dir = str(self.config.github_dir)
+            directories, skipped = {}, {}
+
+            for root, dirs, files in os.walk(github_dir):
+                dirs[:] = [dir for dir in dirs if not dir.startswith(".")] # skip .git & other hidden directories
+                for name in files:
+                    if not name.endswith(tuple(self.config.suffixes)):
+                        continue
+                    file_path = os.path.join(root, name)
+                    path = os.path.relpath(file_path, github_dir).replace(os.sep, "/")
+                    size = os.path.getsize(file_path)
+
+                    reason = "ignore list" if self.is_ignored(path) else self.skip_reason(file_path=file_path, size=size)
+                    if reason:
+                        skipped[path] = reason
+                        continue
+
+                    stats = directories.setdefault(os.path.dirname(path) or ".", {"files": 0, "bytes": 0, "estimated_chunks": 0})
+                    stats["files"] += 1
+                    stats["bytes"] += size
+                    stats["estimated_chunks"] += self.estimate_chunks(size)
+
+            for stats in directories.values():
+                stats["estimated_embedding_seconds"] = round(stats["estimated_chunks"] / self.config.chunks_per_second, 1)
+            totals = {key: sum(stats[key] for stats in directories.values()) for key in ("files", "bytes", "estimated_chunks")}
+            totals["estimated_embedding_seconds"] = round(totals["estimated_chunks"] / self.config.chunks_per_second, 1)
+            totals["skipped_files"] = len(skipped)
+
+            report = {"totals": totals, "directories": directories, "skipped": skipped}
+            create_dir(dirs=[os.path.dirname(str(self.config.report_file))])
+            write_json_file_atomic(file_path=self.config.report_file, data=report)
+            log(file_object=self.log_file, log_message=f"scanned '{github_dir}': {totals}, report '{self.config.report_file}'") # logs the message
+
+            self.enforce_budgets(report=report)
+            return report
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def enforce_budgets(self, report:dict) -> None:
+        """
+            Raises RepoBudgetExceeded, naming the exceeded budgets and the heaviest directories, if the repository is too big.
+        """
+        totals = report["totals"]
+        exceeded = [f"{name} {totals[key]} > {limit}" for name, key, limit in (
+            ("files", "files", self.config.max_files),
+            ("bytes", "bytes", self.config.max_bytes),
+            ("chunks", "estimated_chunks", self.config.max_chunks)
+        ) if totals[key] > limit]
+
+        if exceeded:
+            heaviest = sorted(report["directories"].items(), key=lambda item: item[1]["estimated_chunks"], reverse=True)[:5]
+            heaviest = ", ".join(f"{path} ({stats['estimated_chunks']} chunks)" for path, stats in heaviest)
+            raise RepoBudgetExceeded(f"repository rejected, it exceeds the ingestion budget ({', '.join(exceeded)}); "
+                                     f"heaviest directories: {heaviest}. Add them to the scan ignore list or raise the budget.")
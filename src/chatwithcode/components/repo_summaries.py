@@ -0,0 +1,188 @@
+from chatwithcode.utils.common_utils import log, create_dir, read_json_file, write_json_file_atomic
+from chatwithcode.entity.config_entity import RepoSummaryConfig
+from chatwithcode.components.generate_answer import CUSTOM_SUMMARY_PROMPT
+from chatwithcode.components.symbol_index import code_tokens
+from langchain.prompts import PromptTemplate
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import re
+
+
+OVERVIEW_QUESTION_PATTERN = re.compile(
+    r"\b(explain|summari[sz]e|describe|walk me through|give me an overview of|(an )?(overview|summary) of)\s+"
+    r"(the|this|your)\s+(whole\s+|entire\s+|overall\s+)?(code|code ?base|repo|repository|project)\s*[?.!]?\s*$"
+    r"|\bwhat (does|is) (this|the) (code|code ?base|repo|repository|project)( do| about| for)?\s*[?.!]?\s*$",
+    re.IGNORECASE
+)
+PATH_PATTERN = re.compile(r"\w/\w|\w\.(py|ipynb|md|txt|ya?ml|json|cfg|toml)\b", re.IGNORECASE)
+
+FILE_SUMMARY_PROMPT = PromptTemplate(template="""Summarize the purpose of the python file `{path}` in at most 5 sentences.
+Name its main classes & functions and what they are used for.
+
+File:`{context}`""", input_variables=["path", "context"])
+
+PACKAGE_SUMMARY_PROMPT = PromptTemplate(template="""Summarize the purpose of the package `{path}` in at most 6 sentences, based on the summaries of its files and sub-packages.
+
+Summaries:`{context}`""", input_variables=["path", "context"])
+
+REPO_SUMMARY_PROMPT = PromptTemplate(template=CUSTOM_SUMMARY_PROMPT, input_variables=["context"])
+
+
+def is_overview_question(question:str) -> bool:
+    """
+        Returns True for broad questions about the whole code base (e.g. "explain the code?"), which are answered from the summaries.
+        Questions that name a file, a path or a symbol ("explain the code of StoreEmbeddings.retriever") go to the retrieval.
+    """
+    question = question or ""
+    return bool(OVERVIEW_QUESTION_PATTERN.search(question)) and not PATH_PATTERN.search(question) and not code_tokens(question)
+
+
+class RepoSummarizer:
+    """
+        The RepoSummarizer class generates per-file, per-package and whole-repo summaries as an index-time map-reduce stage:
+            map    -> every python file is summarized (in parallel, at most `max_concurrency` LLM calls at once)
+            reduce -> every directory is summarized from its files & sub-directories, bottom-up; the root directory is the repo summary
+
+        Every summary is cached by content hash, so a rebuild only calls the LLM for changed files and the packages above them.
+        The result is stored as `summaries.json` in the knowledge-base generation directory.
+    """
+    SUMMARIES_FILE = "summaries.json"
+    ROOT = "."
+
+    def __init__(self, config: RepoSummaryConfig, llm) -> None:
+        self.config = config
+        self.llm = llm
+        self.log_file = "logs/logs.log"
+
+
+    def _invoke(self, prompt:str) -> str:
+        """
+            Calls the LLM with a prompt and returns the text of the answer.
+        """
+        answer = self.llm.invoke(prompt)
+        return getattr(answer, "content", answer).strip()
+
+
+    def _collect_files(self, skip_paths:set) -> dict:
+        """
+            Returns the python files of the github directory (except `skip_paths`) as {relative path: sha256 of the content}.
+        """
+        github_dir = str(self.config.github_dir)
+        files = {}
+        for root, dirs, names in os.walk(github_dir):
+            dirs[:] = [dir for dir in dirs if not dir.startswith(".")] # skip .git & other hidden directories
+            for name in names:
+                file_path = os.path.join(root, name)
+                path = os.path.relpath(file_path, github_dir).replace(os.sep, "/")
+                if name.endswith(".py") and path not in skip_paths:
+                    with open(file_path, 'rb') as file:
+                        files[path] = hashlib.sha256(file.read()).hexdigest()
+        return files
+
+
+    def _summarize_file(self, path:str) -> str:
+        with open(os.path.join(str(self.config.github_dir), path), 'r', encoding="utf-8", errors="ignore") as file:
+            content = file.read()[:self.config.max_file_chars]
+        return self._invoke(FILE_SUMMARY_PROMPT.format(path=path, context=content))
+
+
+    def _summarize_package(self, path:str, children:list) -> str:
+        context = "\n".join(f"- {child}: {summary}" for child, summary in children)
+        if path == self.ROOT:
+            return self._invoke(REPO_SUMMARY_PROMPT.format(context=context))
+        return self._invoke(PACKAGE_SUMMARY_PROMPT.format(path=path, context=context))
+
+
+    def summarize(self, generation_dir:str, skip_paths:set=None) -> dict:
+        """
+            Generate (or reuse from the cache) the file, package and repo summaries and store them in the generation directory.
+
+            Args:
+                generation_dir (str): The knowledge-base generation the summaries belong to.
+                skip_paths (set): Paths relative to the repository that are not ingested (see `RepoScanner`).
+
+            Returns:
+                dict: {"repo": summary, "packages": {path: summary}, "files": {path: summary}}
+
+            Raises:
+                Exception: If an error occurs while generating the summaries.
+        """
+        try:
+            cache = read_json_file(file_path=self.config.cache_file, default={"files": {}, "packages": {}})
+            files = self._collect_files(skip_paths=skip_paths or set())
+
+            # map: summarize the new & changed files in parallel
+            stale = [path for path, digest in files.items() if cache["files"].get(path, {}).get("hash") != digest]
+            with ThreadPoolExecutor(max_workers=self.config.max_concurrency) as executor:
+                for path, summary in zip(stale, executor.map(self._summarize_file, stale)):
+                    cache["files"][path] = {"hash": files[path], "summary": summary}
+            log(file_object=self.log_file, log_message=f"summarized '{len(stale)}' changed files, '{len(files) - len(stale)}' reused from cache") # logs the message
+
+            # reduce: summarize the packages bottom-up, the deepest level first, each level in parallel
+            children = {}
+            for path in files:
+                parent = os.path.dirname(path) or self.ROOT
+                children.setdefault(parent, []).append(("file", path))
+                while parent != self.ROOT:
+                    grandparent = os.path.dirname(parent) or self.ROOT
+                    siblings = children.setdefault(grandparent, [])
+                    if ("package", parent) not in siblings:
+                        siblings.append(("package", parent))
+                    parent = grandparent
+
+            packages = {}
+            depth = lambda path: 0 if path == self.ROOT else path.count("/") + 1
+            for level in sorted({depth(path) for path in children}, reverse=True):
+                todo = []
+                for path in [path for path in children if depth(path) == level]:
+                    entries = [(child, cache["files"][child] if kind == "file" else packages[child]) for kind, child in sorted(children[path])]
+                    digest = hashlib.sha256("".join(child + entry["hash"] for child, entry in entries).encode("utf-8")).hexdigest()
+                    if cache["packages"].get(path, {}).get("hash") == digest:
+                        packages[path] = cache["packages"][path]
+                    else:
+                        todo.append((path, digest, [(child, entry["summary"]) for child, entry in entries]))
+
+                with ThreadPoolExecutor(max_workers=self.config.max_concurrency) as executor:
+                    summaries = executor.map(lambda item: self._summarize_package(path=item[0], children=item[2]), todo)
+                    for (path, digest, _), summary in zip(todo, summaries):
+                        packages[path] = {"hash": digest, "summary": summary}
+
+            # keep only the entries of the current tree in the cache
+            cache = {"files": {path: cache["files"][path] for path in files}, "packages": packages}
+            create_dir(dirs=[os.path.dirname(str(self.config.cache_file))])
+            write_json_file_atomic(file_path=self.config.cache_file, data=cache)
+
+            result = {
+                "repo": packages.get(self.ROOT, {}).get("summary", ""),
+                "packages": {path: entry["summary"] for path, entry in packages.items() if path != self.ROOT},
+                "files": {path: entry["summary"] for path, entry in cache["files"].items()}
+            }
+            write_json_file_atomic(file_path=os.path.join(generation_dir, self.SUMMARIES_FILE), data=result)
+            log(file_object=self.log_file, log_message=f"stored the summaries of '{len(files)}' files & '{len(packages)}' packages in '{generation_dir}'") # logs the message
+
+            return result
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def load(self, generation_dir:str) -> dict:
+        """
+            Returns the summaries stored in the generation directory, or None if none were generated.
+        """
+        return read_json_file(file_path=os.path.join(generation_dir, self.SUMMARIES_FILE))
+
+
+    def overview_context(self, summaries:dict) -> str:
+        """
+            Returns the context of an overview question: the repo summary followed by the package summaries, within `max_prompt_chars`.
+        """
+        context = f"Repository:\n{summaries['repo']}\n"
+        for path, summary in sorted(summaries["packages"].items(), key=lambda item: item[0].count("/")): # top-level packages first
+            entry = f"\nPackage {path}:\n{summary}\n"
+            if len(context) + len(entry) > self.config.max_prompt_chars:
+                break
+            context += entry
+        return context
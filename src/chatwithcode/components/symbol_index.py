@@ -0,0 +1,470 @@
+from chatwithcode.utils.common_utils import log, read_json_file, write_json_file_atomic
+from chatwithcode.entity.config_entity import SymbolIndexConfig
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from typing import Any, List
+import ast
+import os
+import re
+
+
+# loaded symbol index of the active generation, keyed by path. Promoted generations never change, so a file is parsed once per process.
+_LOADED_INDEXES = {}
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*")
+DEFINITION_PATTERN = re.compile(r"^\s*(?:async\s+)?(?:def|class)\s+([A-Za-z_]\w*)", re.MULTILINE)
+CODE_SPAN_PATTERN = re.compile(r"`([^`]+)`")
+CAMEL_CASE_PATTERN = re.compile(r"[a-z0-9][A-Z]")
+
+
+def code_tokens(text:str) -> List[str]:
+    """
+        Returns the tokens of a text that are written like code, in order of appearance: inside `backticks`, called (`load()`),
+        qualified (`StoreEmbeddings.retriever`), snake_case or CamelCase. Plain words ("load", "start") are left out, in a
+        question they are far more likely English than symbol names.
+    """
+    quoted = {token for span in CODE_SPAN_PATTERN.findall(text or "") for token in IDENTIFIER_PATTERN.findall(span)}
+    found = []
+    for match in IDENTIFIER_PATTERN.finditer(text or ""):
+        token = match.group()
+        called = text[match.end():match.end() + 1] == "("
+        if token not in found and (token in quoted or called or "." in token or "_" in token or CAMEL_CASE_PATTERN.search(token)):
+            found.append(token)
+    return found
+
+
+class _DefinitionVisitor(ast.NodeVisitor):
+    """
+        Collects the definitions (classes, functions, methods), the calls they make and the imports of one module.
+
+        Every call is recorded with what is known about its target, so it can be resolved precisely later on:
+            foo()                 -> {"name": "foo", "module": <module foo was imported from, if any>}
+            self.foo()            -> {"name": "foo", "owner": <enclosing class>}
+            self.emb.foo()        -> {"name": "foo", "owner": <class assigned to self.emb, e.g. StoreEmbeddings(...)>}
+            emb.foo(), Class.foo(), Class(...).foo() -> {"name": "foo", "owner": <class assigned to emb / Class>}
+        Calls on receivers of unknown type (e.g. `data.get()`) are left out, they can't be resolved reliably.
+    """
+    def __init__(self, module:str, path:str, source:str, max_snippet_chars:int) -> None:
+        self.module = module
+        self.path = path
+        self.source = source
+        self.max_snippet_chars = max_snippet_chars
+        self.scope = []
+        self.classes = []
+        self.attribute_types = {} # class qualname -> {attribute: class name} from `self.attribute = Class(...)`
+        self.definitions = []
+        self.calls = {}
+        self.imports = set()
+        self.imported_names = {} # local name -> module it was imported from
+
+    def visit_Module(self, node) -> None:
+        for child in ast.walk(node): # imports first, wherever they are, so every call can be resolved
+            if isinstance(child, ast.Import):
+                for alias in child.names:
+                    self.imports.add(alias.name)
+                    self.imported_names[alias.asname or alias.name.split(".")[0]] = alias.name if alias.asname else alias.name.split(".")[0]
+            elif isinstance(child, ast.ImportFrom) and child.module:
+                self.imports.add(child.module)
+                for alias in child.names:
+                    self.imported_names[alias.asname or alias.name] = child.module
+        self.generic_visit(node)
+
+    @staticmethod
+    def _own_nodes(node):
+        """
+            Yields (node, conditional) for the nodes of a definition, without the bodies of the definitions nested in it.
+            A node is conditional when it is part of an `if` statement or expression (which guards early returns & special
+            cases) or of an `except` handler.
+        """
+        stack = [(child, False) for child in ast.iter_child_nodes(node)]
+        while stack:
+            child, conditional = stack.pop()
+            yield child, conditional
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                continue
+            for grandchild in ast.iter_child_nodes(child):
+                stack.append((grandchild, conditional or isinstance(child, (ast.If, ast.IfExp, ast.ExceptHandler))))
+
+    @staticmethod
+    def _constructed_class(value) -> str:
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id[:1].isupper():
+            return value.func.id
+        return None
+
+    def _reference(self, func, local_types:dict) -> dict:
+        if isinstance(func, ast.Name):
+            return {"name": func.id, "module": self.imported_names.get(func.id)}
+        if not isinstance(func, ast.Attribute):
+            return None
+
+        receiver, owner = func.value, None
+        if isinstance(receiver, ast.Name):
+            if receiver.id == "self" and self.classes:
+                owner = self.classes[-1].rsplit(".", 1)[-1]
+            elif receiver.id in local_types:
+                owner = local_types[receiver.id]
+            elif receiver.id[:1].isupper():
+                owner = receiver.id # class attribute / static call, e.g. SymbolIndex.build
+            elif receiver.id in self.imported_names:
+                return {"name": func.attr, "module": self.imported_names[receiver.id]} # module.function()
+        elif self._constructed_class(receiver):
+            owner = self._constructed_class(receiver) # Class(...).method()
+        elif isinstance(receiver, ast.Attribute) and isinstance(receiver.value, ast.Name) and receiver.value.id == "self" and self.classes:
+            owner = self.attribute_types.get(self.classes[-1], {}).get(receiver.attr)
+        return {"name": func.attr, "owner": owner} if owner else None
+
+    def _add_definition(self, node, kind:str) -> None:
+        qualname = ".".join(self.scope + [node.name])
+        snippet = ast.get_source_segment(self.source, node) or ""
+        self.definitions.append({
+            "name": node.name,
+            "qualname": qualname,
+            "kind": kind,
+            "module": self.module,
+            "path": self.path,
+            "start_line": node.lineno,
+            "end_line": getattr(node, "end_lineno", node.lineno),
+            "snippet": snippet[:self.max_snippet_chars]
+        })
+
+        nodes = sorted(((child, conditional) for child, conditional in self._own_nodes(node) if hasattr(child, "lineno")),
+                       key=lambda item: (item[0].lineno, item[0].col_offset))
+        local_types = {}
+        for child, _ in nodes:
+            if isinstance(child, ast.Assign) and self._constructed_class(child.value):
+                for target in child.targets:
+                    if isinstance(target, ast.Name):
+                        local_types[target.id] = self._constructed_class(child.value)
+
+        references = {}
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                if isinstance(base, ast.Name):
+                    references[(base.id, None, self.imported_names.get(base.id))] = {"name": base.id, "module": self.imported_names.get(base.id), "base": True,
+                                                                                   "lines": [node.lineno], "main_lines": [node.lineno]}
+        for child, conditional in nodes: # in source order
+            if not isinstance(child, ast.Call):
+                continue
+            reference = self._reference(child.func, local_types)
+            if reference is None or reference["name"] == node.name and not reference.get("owner"):
+                continue
+            key = (reference["name"], reference.get("owner"), reference.get("module"))
+            reference = references.setdefault(key, dict(reference, lines=[], main_lines=[]))
+            reference["lines"].append(child.lineno)
+            if not conditional:
+                reference["main_lines"].append(child.lineno)
+        self.calls[qualname] = list(references.values())
+
+    def visit_ClassDef(self, node) -> None:
+        qualname = ".".join(self.scope + [node.name])
+        types = self.attribute_types.setdefault(qualname, {})
+        for child in ast.walk(node): # `self.attribute = Class(...)` anywhere in the methods
+            if isinstance(child, ast.Assign) and self._constructed_class(child.value):
+                for target in child.targets:
+                    if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self":
+                        types.setdefault(target.attr, self._constructed_class(child.value))
+
+        self._add_definition(node, kind="class")
+        self.scope.append(node.name)
+        self.classes.append(qualname)
+        self.generic_visit(node)
+        self.classes.pop()
+        self.scope.pop()
+
+    def visit_FunctionDef(self, node) -> None:
+        self._add_definition(node, kind="method" if self.classes and self.scope[-1] == self.classes[-1].rsplit(".", 1)[-1] else "function")
+        self.scope.append(node.name)
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+class SymbolIndex:
+    """
+        The SymbolIndex class builds and queries a persisted symbol table (definitions with file:line) and an import/call graph of
+        the python sources of the github directory. It is stored as `symbols.json` next to the chromadb of a knowledge-base
+        generation, so it is swapped together with the embeddings.
+
+        Layout of symbols.json:
+            definitions -> qualified name (e.g. "ChatWithCode.predict") -> list of definitions
+            names       -> short name (e.g. "predict") -> list of qualified names
+            calls       -> qualified name -> calls made by the definition, in source order: the called name, its owner class or
+                           the module it was imported from when known, and the lines of the calls
+            imports     -> module -> imported modules
+    """
+    SYMBOLS_FILE = "symbols.json"
+
+    def __init__(self, config: SymbolIndexConfig) -> None:
+        self.config = config
+        self.log_file = "logs/logs.log"
+        self.data = {"definitions": {}, "names": {}, "calls": {}, "imports": {}}
+        self._leaves = {}
+
+
+    def build(self, skip_paths:set=None) -> "SymbolIndex":
+        """
+            Parse every python file of the github directory and build the symbol table & the import/call graph.
+
+            Args:
+                skip_paths (set): Paths relative to the repository that are not ingested (see `RepoScanner`).
+
+            Returns:
+                SymbolIndex: The instance itself.
+
+            Raises:
+                Exception: If an error occurs while building the index.
+        """
+        try:
+            definitions, names, calls, imports = {}, {}, {}, {}
+            github_dir = str(self.config.github_dir)
+
+            for root, dirs, files in os.walk(github_dir):
+                dirs[:] = [dir for dir in dirs if not dir.startswith(".")] # skip .git & other hidden directories
+                for file_name in files:
+                    if not file_name.endswith(".py"):
+                        continue
+                    file_path = os.path.join(root, file_name)
+                    path = os.path.relpath(file_path, github_dir).replace(os.sep, "/")
+                    if skip_paths and path in skip_paths:
+                        continue
+                    module = path[:-3].replace("/", ".")
+                    try:
+                        with open(file_path, 'r', encoding="utf-8") as file:
+                            source = file.read()
+                        tree = ast.parse(source)
+                    except (SyntaxError, UnicodeDecodeError, ValueError):
+                        continue # not parseable as python 3, still embedded but not indexed
+
+                    visitor = _DefinitionVisitor(module=module, path=path, source=source, max_snippet_chars=self.config.max_snippet_chars)
+                    visitor.visit(tree)
+                    for definition in visitor.definitions:
+                        definitions.setdefault(definition["qualname"], []).append(definition)
+                        qualnames = names.setdefault(definition["name"], [])
+                        if definition["qualname"] not in qualnames:
+                            qualnames.append(definition["qualname"])
+                    for qualname, references in visitor.calls.items():
+                        calls.setdefault(qualname, []).extend(references)
+                    imports[module] = sorted(visitor.imports)
+
+            self.data = {"definitions": definitions, "names": names, "calls": calls, "imports": imports}
+            self._leaves = {}
+            log(file_object=self.log_file, log_message=f"built the symbol index of '{github_dir}', '{len(definitions)}' symbols in '{len(imports)}' modules") # logs the message
+
+            return self
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def save(self, generation_dir:str) -> None:
+        """
+            Persist the symbol index into the given knowledge-base generation directory.
+        """
+        write_json_file_atomic(file_path=os.path.join(generation_dir, self.SYMBOLS_FILE), data=self.data)
+
+
+    def load(self, generation_dir:str) -> bool:
+        """
+            Load the symbol index of the given knowledge-base generation directory.
+
+            Returns:
+                bool: False if the generation has no symbol index (e.g. it was built before symbol indexing existed).
+        """
+        file_path = os.path.join(generation_dir, self.SYMBOLS_FILE)
+        if file_path not in _LOADED_INDEXES:
+            data = read_json_file(file_path=file_path)
+            if data is None:
+                return False
+            _LOADED_INDEXES.clear() # forget the previous generation, in-flight readers keep their own reference
+            _LOADED_INDEXES[file_path] = data
+        self.data = _LOADED_INDEXES[file_path]
+        self._leaves = {}
+        return True
+
+
+    def lookup(self, identifier:str) -> List[dict]:
+        """
+            Returns the definitions of an identifier, either a qualified name ("StoreEmbeddings.retriever") or a short name ("retriever").
+        """
+        if identifier in self.data["definitions"]:
+            return self.data["definitions"][identifier]
+
+        found = []
+        for qualname in self.data["names"].get(identifier.rsplit(".", 1)[-1], []):
+            if "." not in identifier or qualname.endswith(identifier):
+                found.extend(self.data["definitions"][qualname])
+        return found
+
+
+    def find_identifiers(self, text:str) -> List[str]:
+        """
+            Returns the known identifiers mentioned in a text (e.g. a question), in order of appearance.
+            Only tokens written like code count (see `code_tokens`).
+        """
+        return [token for token in code_tokens(text)
+                if token in self.data["definitions"] or token.rsplit(".", 1)[-1] in self.data["names"]]
+
+
+    def resolve(self, reference, module:str=None) -> List[dict]:
+        """
+            Returns the definitions a call of the call graph refers to. A call is only resolved when its target is known: a
+            method of a known class, a name imported from a module of the repository, or a function of the calling module / a
+            unique top-level name. Calling a class resolves to its `__init__`, never to the whole class body (except for bases).
+
+            Args:
+                reference (dict|str): A call of the call graph (a plain name in indexes built before calls were typed).
+                module (str): The module of the calling definition.
+        """
+        if isinstance(reference, str):
+            reference = {"name": reference}
+        name, owner, imported_from = reference["name"], reference.get("owner"), reference.get("module")
+
+        if owner:
+            return [definition for qualname in self.data["names"].get(name, []) if qualname == f"{owner}.{name}" or qualname.endswith(f".{owner}.{name}")
+                    for definition in self.data["definitions"][qualname]]
+
+        found = self.data["definitions"].get(name, []) # top-level definitions only
+        if imported_from:
+            found = [definition for definition in found
+                     if definition["module"] == imported_from or definition["module"].endswith(f".{imported_from}") or imported_from.endswith(f".{definition['module']}")]
+        elif len(found) > 1:
+            found = [definition for definition in found if definition["module"] == module]
+        if reference.get("base"):
+            return found
+
+        resolved = []
+        for definition in found:
+            if definition["kind"] != "class":
+                resolved.append(definition)
+                continue
+            resolved.extend(constructor for constructor in self.data["definitions"].get(f"{name}.__init__", []) if constructor["path"] == definition["path"])
+        return resolved
+
+
+    def is_leaf(self, definition:dict) -> bool:
+        """
+            Returns True if a definition calls no method or function of the repository (e.g. a config getter or a logger).
+        """
+        key = (definition["path"], definition["qualname"])
+        if key not in self._leaves:
+            self._leaves[key] = not any(target["kind"] != "class" and target["name"] != "__init__"
+                                        for reference in self.data["calls"].get(definition["qualname"], [])
+                                        for target in self.resolve(reference, module=definition["module"]))
+        return self._leaves[key]
+
+
+    def referenced_definitions(self, document:Document) -> List[dict]:
+        """
+            Returns the definitions of the symbols referenced (called) by a retrieved chunk, in the order they are called:
+            first the methods & functions that call further into the repository, those on the main path before those only
+            called in a branch (`if`, `except`), then the leaf ones (config getters, loggers), then the
+            constructors (`__init__`), then the classes (bases).
+        """
+        path = document.metadata.get("path")
+        start_line, end_line = document.metadata.get("start_line"), document.metadata.get("end_line")
+        callers = [] # (qualname, module) of the definitions whose calls are in the chunk
+        if path is not None and start_line is not None and end_line is not None:
+            for qualname, definitions in self.data["definitions"].items():
+                for definition in definitions:
+                    if definition["path"] == path and definition["start_line"] <= end_line and definition["end_line"] >= start_line:
+                        callers.append((qualname, definition["module"]))
+        else:
+            start_line = end_line = None
+            qualnames = [document.metadata["symbol"]] if document.metadata.get("symbol") else []
+            for name in DEFINITION_PATTERN.findall(document.page_content):
+                for qualname in self.data["names"].get(name, []):
+                    definitions = self.data["definitions"][qualname]
+                    if path is None or any(definition["path"] == path for definition in definitions):
+                        qualnames.append(qualname)
+            for qualname in qualnames:
+                for definition in self.data["definitions"].get(qualname, [])[:1]:
+                    callers.append((qualname, definition["module"]))
+
+        ranked = []
+        for qualname, module in callers:
+            for reference in self.data["calls"].get(qualname, []):
+                lines = reference.get("lines", []) if isinstance(reference, dict) else []
+                main_lines = reference.get("main_lines", lines) if isinstance(reference, dict) else []
+                if start_line is not None and lines:
+                    lines = [line for line in lines if start_line <= line <= end_line]
+                    main_lines = [line for line in main_lines if start_line <= line <= end_line]
+                    if not lines:
+                        continue # called outside of the chunk
+                line = min(main_lines or lines or [0])
+                for definition in self.resolve(reference, module=module):
+                    if definition["kind"] == "class":
+                        rank = 4
+                    elif definition["name"] == "__init__":
+                        rank = 3
+                    elif self.is_leaf(definition):
+                        rank = 2
+                    else:
+                        rank = 0 if main_lines else 1
+                    ranked.append((rank, line, len(ranked), definition))
+
+        found, seen = [], set()
+        for _, _, _, definition in sorted(ranked, key=lambda item: item[:3]):
+            key = (definition["path"], definition["qualname"], definition["start_line"])
+            if key not in seen:
+                seen.add(key)
+                found.append(definition)
+        return found
+
+
+    def to_document(self, definition:dict) -> Document:
+        """
+            Converts a definition of the symbol table into a document for the QA chain.
+        """
+        return Document(page_content=definition["snippet"],
+                        metadata={"source": os.path.join(str(self.config.github_dir), definition["path"]),
+                                  "path": definition["path"],
+                                  "symbol": definition["qualname"],
+                                  "start_line": definition["start_line"],
+                                  "end_line": definition["end_line"]})
+
+
+class SymbolExpandedRetriever(BaseRetriever):
+    """
+        Retriever that combines the symbol table with the similarity search of the vector database:
+            1. identifiers named in the question are resolved directly through the symbol table,
+            2. the similarity search fills the remaining slots,
+            3. the top hits are expanded with the definitions of the symbols they reference.
+        The total number of documents never exceeds `k`, and the direct hits never take more than `max_direct` of it, so the
+        similarity search always contributes. With a scope (PathScope), symbols outside of it are left out.
+    """
+    vector_retriever: BaseRetriever
+    symbol_index: Any
+    k: int = 15
+    max_direct: int = 3
+    max_expansions: int = 4
+    scope: Any = None
+
+    def _get_relevant_documents(self, query:str, *, run_manager:CallbackManagerForRetrieverRun) -> List[Document]:
+        seen = set()
+
+        def unique(documents):
+            for document in documents:
+                if self.scope is not None and not self.scope.matches(document.metadata.get("path")):
+                    continue
+                key = (document.metadata.get("source"), document.metadata.get("start_line"), document.page_content[:200])
+                if key not in seen:
+                    seen.add(key)
+                    yield document
+
+        direct = []
+        for identifier in self.symbol_index.find_identifiers(query):
+            direct.extend(self.symbol_index.to_document(definition) for definition in self.symbol_index.lookup(identifier))
+        direct = list(unique(direct))[:min(self.max_direct, self.k)]
+
+        similar = list(unique(self.vector_retriever.get_relevant_documents(query, callbacks=run_manager.get_child())))
+
+        expansions = []
+        for document in (direct + similar)[:3]: # expand the top hits only
+            expansions.extend(self.symbol_index.to_document(definition) for definition in self.symbol_index.referenced_definitions(document))
+        expansions = list(unique(expansions))[:self.max_expansions]
+
+        slots = max(self.k - len(direct) - len(expansions), 0)
+        return (direct + similar[:slots] + expansions)[:self.k]
@@ -1,13 +1,22 @@
-from chatwithcode.utils.common_utils import log, clean_prev_dirs_if_exis, create_dir
+from chatwithcode.utils.common_utils import log, read_json_file, write_json_file_atomic, get_memory_usage_mb
 from chatwithcode.entity.config_entity import StoreEmbeddingVectorDBConfig
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations, release_chromadb
+from chatwithcode.components.symbol_index import SymbolIndex, SymbolExpandedRetriever
+from chatwithcode.components.onnx_embeddings import OnnxEmbeddingBackend
+from chatwithcode.components.embedding_service import get_embedding_service_client
+from chatwithcode.components.path_scope import PathScope, path_metadata, PATHS_FILE
 from langchain.text_splitter import Language
 from langchain.document_loaders.generic import GenericLoader
 from langchain.document_loaders.parsers import LanguageParser
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
-from typing import List
+from typing import List, Iterator, Tuple
+import hashlib
+import time
+import gc
 import os
 from dotenv import load_dotenv
 
@@ -16,6 +25,15 @@ from dotenv import load_dotenv
 load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
 
+# embedding models & opened chromadbs of this process, so requests don't reload them:
+_EMBEDDING_MODELS = {}
+_VECTORDBS = {}
+# chromadbs of previous generations {path: retired at}, released once the queries still running on them are done:
+_RETIRED_VECTORDBS = {}
+RETIRED_VECTORDB_SECONDS = 60
+# when the retired generations were last garbage-collected by this process:
+_LAST_CLEANUP = {"time": time.time()}
+
 
 class StoreEmbeddings:
     """
@@ -27,27 +45,93 @@ class StoreEmbeddings:
         self.log_file = "logs/logs.log"
     
 
-    def load_embedding_model(self) -> HuggingFaceEmbeddings:
+    def load_embedding_model(self) -> Embeddings:
         """
             Load the embedding model using the specified model name from the configuration.
 
+            If the embedding service is enabled, a client of the service is returned: the model is only loaded in-process (see
+            `load_local_embedding_model`) if and while the service can't be reached. Otherwise the model is loaded in-process.
+
+            Returns:
+                Embeddings: The loaded embedding model.
+
+            Raises:
+                Exception: If an error occurs while loading the embedding model.
+        """
+        try:
+            if self.config.embedding_service.enabled:
+                # shared model of the embedding service, each call falls back to the in-process model while the service is down
+                self.embeddings = get_embedding_service_client(config=self.config.embedding_service, model_name=self.config.embedding_model_name,
+                                                               local_factory=self.load_local_embedding_model)
+                return self.embeddings
+
+            return self.load_local_embedding_model()
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def load_local_embedding_model(self) -> Embeddings:
+        """
+            Load the embedding model in this process (once, later calls return the same model).
+
+            With the 'onnx' backend the model runs with onnxruntime if its (int8) ONNX export passed the parity check against
+            the torch vectors (see `OnnxEmbeddingBackend.prepare`, an offline step); otherwise it runs through torch.
+
             Returns:
-                HuggingFaceEmbeddings: The loaded embedding model.
+                Embeddings: The loaded embedding model.
 
             Raises:
                 Exception: If an error occurs while loading the embedding model.
         """
         try:
+            key = (self.config.embedding_backend, self.config.embedding_model_name)
+            if key in _EMBEDDING_MODELS:
+                self.embeddings = _EMBEDDING_MODELS[key]
+                return self.embeddings
+
+            if self.config.embedding_backend == "onnx":
+                self.embeddings = OnnxEmbeddingBackend(config=self.config.onnx_config).load()
+                if self.embeddings is not None:
+                    log(file_object=self.log_file, log_message=f"load the onnx embedding model, i.e. '{self.config.embedding_model_name}'") # log the message
+                    _EMBEDDING_MODELS[key] = self.embeddings
+                    return self.embeddings
+                log(file_object=self.log_file, log_message=f"no onnx model that passed the parity check, fall back to torch") # log the message
+
             self.embeddings = HuggingFaceEmbeddings(model_name=self.config.embedding_model_name) # load the embedding model
             log(file_object=self.log_file, log_message=f"load the embedding model, i.e. '{self.config.embedding_model_name}'") # log the message
+            _EMBEDDING_MODELS[key] = self.embeddings
 
             return self.embeddings # return embeding model
 
         except Exception as ex:
             log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
             raise ex
-    
-    
+
+
+    def _create_loader(self) -> GenericLoader:
+        """
+            Returns the loader for the python files of the github directory.
+        """
+        return GenericLoader.from_filesystem(path=self.config.github_dir,
+                                             glob="**/*",
+                                             suffixes=[".py"],
+                                             parser=LanguageParser(language=Language.PYTHON, parser_threshold=500)
+                                            )
+
+
+    def _create_splitter(self) -> RecursiveCharacterTextSplitter:
+        """
+            Returns the text splitter used to chunk the documents.
+        """
+        return RecursiveCharacterTextSplitter.from_language(
+            language=Language.PYTHON,
+            chunk_size=self.config.chunk_zise,
+            chunk_overlap=self.config.overlap
+        )
+
+
     def get_documents(self) -> List[Document]:
         """
             Load and return the documents from the specified directory.
@@ -60,11 +144,7 @@ class StoreEmbeddings:
         """
         try:
             # load the data from github directory:
-            self.loader = GenericLoader.from_filesystem(path=self.config.github_dir,
-                                                        glob="**/*",
-                                                        suffixes=[".py"],
-                                                        parser=LanguageParser(language=Language.PYTHON, parser_threshold=500)
-                                                        )
+            self.loader = self._create_loader()
             self.documents = self.loader.load()  # load the data as document
             log(file_object=self.log_file, log_message=f"successfully load the documents from '{self.config.github_dir}', where size is '{len(self.documents)}'")  # logs the message
 
@@ -86,11 +166,7 @@ class StoreEmbeddings:
                 list: A list of smaller chunks obtained by splitting the input documents.
         """
         try:
-            self.documents_splitter = RecursiveCharacterTextSplitter.from_language(
-                language=Language.PYTHON,
-                chunk_size=self.config.chunk_zise,
-                chunk_overlap=self.config.overlap
-            )
+            self.documents_splitter = self._create_splitter()
             self.chunks = self.documents_splitter.split_documents(documents)
             log(file_object=self.log_file, log_message=f"successfully perform the chunkings, where chunks  size is '{len(self.chunks)}'") # logs the message
 
@@ -105,6 +181,9 @@ class StoreEmbeddings:
         """
             Create a knowledge base by storing embeddings of chunks of documents into a Chroma database.
 
+            The embeddings are written into a new staging generation, validated (chunk count and a smoke query) and only then
+            promoted as the active generation, so queries keep being served from the previous knowledge base during the rebuild.
+
             Args:
                 chunks (list): A list of smaller chunks obtained by splitting the input documents.
 
@@ -121,34 +200,284 @@ class StoreEmbeddings:
                 store_embeddings.create_knowledgebase(chunks)
         """
         try:
-            self.persist_directory = self.config.chromadb_dir # get the path of chromadb
+            self.generations = KnowledgeBaseGenerations(config=self.config)
+            self.generation_id = self.generations.create_staging() # build into a staging generation
+            self.persist_directory = self.generations.generation_path(self.generation_id) # get the path of staging chromadb
+
+            try:
+                # store embeddings into vectordb:
+                self.chroma_vector_db = Chroma.from_documents(documents=chunks,
+                                                              embedding=self.load_embedding_model(),
+                                                              persist_directory=self.persist_directory
+                                                            )
+                log(file_object=self.log_file, log_message=f"successfully store the embeddings into staging chromadb, path '{self.persist_directory}'") # logs the message
+
+                self.validate_knowledgebase(vectordb=self.chroma_vector_db, expected_chunks=len(chunks)) # validate before promotion
+
+            except Exception:
+                self.generations.discard(self.generation_id) # never promote a broken build
+                raise
+
+            self.generations.promote(self.generation_id) # atomic swap, queries now use the new knowledge base
+            checkpoint = read_json_file(file_path=self.config.checkpoint_file, default={})
+            self.generations.cleanup(keep=[checkpoint.get("generation_id")]) # remove old generations once their grace period expired
+            log(file_object=self.log_file, log_message=f"successfully promoted the knowledgebase '{self.persist_directory}'") # logs the message
+
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
+            raise ex
+
+
+    def validate_knowledgebase(self, vectordb:Chroma, expected_chunks:int) -> None:
+        """
+            Validates a freshly built knowledge base before it is promoted.
+
+            Args:
+                vectordb (Chroma): The staging Chroma database.
+                expected_chunks (int): The number of chunks that were embedded.
+
+            Raises:
+                ValueError: If the chunk count does not match or the smoke query returns nothing.
+        """
+        count = vectordb._collection.count()
+        if count != expected_chunks:
+            raise ValueError(f"knowledgebase validation failed: stored '{count}' chunks, expected '{expected_chunks}'")
+
+        if expected_chunks and not vectordb.similarity_search(self.config.smoke_query, k=1):
+            raise ValueError(f"knowledgebase validation failed: smoke query '{self.config.smoke_query}' returned no result")
+
+        log(file_object=self.log_file, log_message=f"knowledgebase validated, '{count}' chunks & smoke query ok") # logs the message
+
 
-            clean_prev_dirs_if_exis(dir_path=self.persist_directory) # clean the directory if already exists
-            log(file_object=self.log_file, log_message=f"successfully clean the existing directory '{self.persist_directory}'") # logs the message
+    def iter_file_chunks(self, skip_sources:set=None, skip_paths:set=None) -> Iterator[Tuple[str, List[Document]]]:
+        """
+            Lazily loads and chunks the github directory one file at a time, so only a single file is held in memory.
+
+            Args:
+                skip_sources (set): Source paths that are already indexed and must be skipped.
+                skip_paths (set): Paths relative to the repository that must not be ingested (e.g. junk files found by the repo scan).
+
+            Yields:
+                tuple: (source path, list of chunks of that file)
+        """
+        skip_sources = skip_sources or set()
+        skip_paths = skip_paths or set()
+        loader = self._create_loader()
+        splitter = self._create_splitter()
+
+        for blob in loader.blob_loader.yield_blobs():
+            source = str(blob.source)
+            path = os.path.relpath(source, str(self.config.github_dir)).replace(os.sep, "/")
+            if source in skip_sources or path in skip_paths:
+                continue
+            documents = list(loader.blob_parser.lazy_parse(blob))
+            chunks = splitter.split_documents(documents)
+            yield source, self.annotate_chunks(chunks=chunks, path=path, text=blob.as_string())
+
+
+    @staticmethod
+    def annotate_chunks(chunks:List[Document], path:str, text:str) -> List[Document]:
+        """
+            Adds the path relative to the repository, its directories & file type (used to scope queries, see `path_metadata`)
+            and the line range (when the chunk is a verbatim part of the file) to the metadata of the chunks of a file.
+
+            Args:
+                chunks (list): The chunks of one file.
+                path (str): The path of the file relative to the github directory.
+                text (str): The content of the file.
+
+            Returns:
+                list: The same chunks.
+        """
+        metadata = path_metadata(path)
+        for chunk in chunks:
+            chunk.metadata.update(metadata)
+            position = text.find(chunk.page_content)
+            if position >= 0: # the parser's simplified code (with placeholders) is not a verbatim part of the file
+                chunk.metadata["start_line"] = text.count("\n", 0, position) + 1
+                chunk.metadata["end_line"] = chunk.metadata["start_line"] + chunk.page_content.count("\n")
+        return chunks
+
+
+    def get_batch_size(self) -> int:
+        """
+            Computes how many chunks can be embedded & committed at once without exceeding the configured peak RSS.
+
+            Returns:
+                int: The batch size, between `min_batch_size` and `max_batch_size`.
+        """
+        # rough memory needed per chunk while embedding: text, token ids and transformer activations.
+        bytes_per_chunk = self.config.chunk_zise * 64
+        headroom_mb = self.config.peak_rss_mb - get_memory_usage_mb()
+        if headroom_mb <= 0:
+            gc.collect()
+            return self.config.min_batch_size
+
+        batch_size = int(headroom_mb * 1024 * 1024 / bytes_per_chunk)
+        return max(self.config.min_batch_size, min(self.config.max_batch_size, batch_size))
+
+
+    @staticmethod
+    def chunk_id(source:str, index:int) -> str:
+        """
+            Returns a deterministic id for the index-th chunk of a file, so re-committing a batch after a resume is an upsert.
+        """
+        return hashlib.sha1(f"{source}:{index}".encode("utf-8")).hexdigest()
+
+
+    def _load_checkpoint(self, source:dict) -> dict:
+        """
+            Returns the checkpoint of an unfinished build of the same source, or None if there is nothing to resume.
+        """
+        checkpoint = read_json_file(file_path=self.config.checkpoint_file)
+        if not checkpoint:
+            return None
 
-            create_dir(dirs=[self.persist_directory]) # recreate the directory
-            log(file_object=self.log_file, log_message=f"successfully recreate directory '{self.persist_directory}'") # logs the message
+        generation_id = checkpoint.get("generation_id")
+        staging = self.generations.read_metadata(generation_id) if generation_id else {}
+        if checkpoint.get("source") == source and staging.get("status") == "staging":
+            return checkpoint
 
-            # store embeddings into vectordb:
-            self.chroma_vector_db = Chroma.from_documents(documents=chunks,
-                                                          embedding=self.load_embedding_model(),
-                                                          persist_directory=self.persist_directory
-                                                        )
+        # stale checkpoint (other repo/commit or the staging generation is gone): start over.
+        if generation_id:
+            self.generations.discard(generation_id)
+        os.remove(self.config.checkpoint_file)
+        return None
 
-            log(file_object=self.log_file, log_message=f"successfully store the embeddings into chromadb, path '{self.config.chromadb_dir}'") # logs the message
 
+    def _save_checkpoint(self, checkpoint:dict) -> None:
+        """
+            Durably records the indexing progress.
+        """
+        checkpoint["updated_at"] = time.time()
+        write_json_file_atomic(file_path=self.config.checkpoint_file, data=checkpoint)
+
+
+    def build_knowledgebase(self, source:dict, symbol_index:SymbolIndex=None, skip_paths:set=None) -> int:
+        """
+            Create a knowledge base from the github directory as a bounded-memory pipeline.
+
+            Files are loaded and chunked one at a time, and the chunks are embedded & committed to a staging generation in
+            batches sized from the configured peak RSS. After every batch a checkpoint (files done, last batch) is written,
+            so a rerun after a crash or cancellation resumes where it stopped. Once every file is committed the generation is
+            validated and promoted like in `create_knowledgebase`.
+
+            Args:
+                source (dict): Identifies what is indexed, e.g. {"url": ..., "commit": ...}. A checkpoint is only resumed for the same source.
+                symbol_index (SymbolIndex): Optional symbol index, built & stored with the generation before it is promoted.
+                skip_paths (set): Paths relative to the repository that must not be ingested (see `RepoScanner`).
+
+            Returns:
+                int: The number of chunks in the knowledge base.
+
+            Raises:
+                Exception: If an error occurs during the process. The checkpoint is kept so the build can be resumed.
+
+            Example Usage:
+                store_embeddings = StoreEmbeddings(config)
+                store_embeddings.build_knowledgebase(source={"url": url, "commit": commit})
+        """
+        try:
+            self.generations = KnowledgeBaseGenerations(config=self.config)
+            checkpoint = self._load_checkpoint(source=source)
+            if checkpoint:
+                self.generation_id = checkpoint["generation_id"]
+                log(file_object=self.log_file, log_message=f"resume indexing generation '{self.generation_id}' after batch '{checkpoint['batches']}', '{len(checkpoint['files_done'])}' files done") # logs the message
+            else:
+                self.generation_id = self.generations.create_staging() # build into a staging generation
+                self.generations.update_metadata(self.generation_id, source=source)
+                checkpoint = {"source": source, "generation_id": self.generation_id, "files_done": {}, "batches": 0}
+                self._save_checkpoint(checkpoint)
+            self.generations.cleanup(keep=[self.generation_id])
+
+            self.persist_directory = self.generations.generation_path(self.generation_id)
+            self.chroma_vector_db = Chroma(persist_directory=self.persist_directory, embedding_function=self.load_embedding_model())
+
+            files_done = checkpoint["files_done"]
+            pending_chunks, pending_ids, pending_files = [], [], {}
+            batch_size = self.get_batch_size()
+
+            def commit_batch():
+                if pending_chunks:
+                    self.chroma_vector_db.add_documents(documents=pending_chunks, ids=pending_ids) # embed & upsert the batch
+                files_done.update(pending_files)
+                checkpoint["batches"] += 1
+                self._save_checkpoint(checkpoint)
+                log(file_object=self.log_file, log_message=f"committed batch '{checkpoint['batches']}' of '{len(pending_chunks)}' chunks, '{len(files_done)}' files done, rss '{get_memory_usage_mb():.0f}' MB") # logs the message
+                pending_chunks.clear()
+                pending_ids.clear()
+                pending_files.clear()
+
+            for file_source, chunks in self.iter_file_chunks(skip_sources=set(files_done), skip_paths=skip_paths):
+                for index, chunk in enumerate(chunks):
+                    pending_chunks.append(chunk)
+                    pending_ids.append(self.chunk_id(file_source, index))
+                    if len(pending_chunks) >= batch_size:
+                        commit_batch()
+                        batch_size = self.get_batch_size() # re-size from the current memory usage
+                pending_files[file_source] = len(chunks) # the file is done once its last chunk is committed
+
+            if pending_chunks or pending_files:
+                commit_batch()
+
+            expected_chunks = sum(files_done.values())
+            try:
+                self.validate_knowledgebase(vectordb=self.chroma_vector_db, expected_chunks=expected_chunks)
+            except Exception:
+                self.generations.discard(self.generation_id) # never promote (or resume) a broken build
+                os.remove(self.config.checkpoint_file)
+                raise
+
+            paths = sorted(os.path.relpath(source, str(self.config.github_dir)).replace(os.sep, "/") for source in files_done)
+            write_json_file_atomic(file_path=os.path.join(self.persist_directory, PATHS_FILE), data=paths) # resolves the globs of scoped queries
+            if symbol_index is not None:
+                symbol_index.build(skip_paths=skip_paths).save(generation_dir=self.persist_directory) # swapped together with the embeddings
+
+            self.generations.update_metadata(self.generation_id, chunks=expected_chunks, files=len(files_done))
+            self.generations.promote(self.generation_id) # atomic swap, queries now use the new knowledge base
+            os.remove(self.config.checkpoint_file) # the build is complete, nothing to resume
+            self.generations.cleanup()
+            log(file_object=self.log_file, log_message=f"successfully promoted the knowledgebase '{self.persist_directory}' with '{expected_chunks}' chunks") # logs the message
+
+            return expected_chunks
 
         except Exception as ex:
             log(file_object=self.log_file, log_message=f"Error occurred: {ex}") # log the exception
             raise ex
 
 
-    def retriever(self, k:int) -> List[Document]:
+    def release_retired_generations(self) -> None:
+        """
+            Releases the chromadbs of previous generations once no query can still be running on them, and garbage-collects
+            the retired generations at most once per grace period, so they are removed even if no rebuild follows.
+        """
+        now = time.time()
+        for path, retired_at in list(_RETIRED_VECTORDBS.items()):
+            if now - retired_at >= RETIRED_VECTORDB_SECONDS or not os.path.isdir(path):
+                release_chromadb(path)
+                del _RETIRED_VECTORDBS[path]
+                log(file_object=self.log_file, log_message=f"released the chromadb of the retired generation '{path}'") # logs the message
+
+        if now - _LAST_CLEANUP["time"] >= self.config.grace_period:
+            _LAST_CLEANUP["time"] = now
+            KnowledgeBaseGenerations(config=self.config).cleanup(retired_only=True) # a build may be running in another process
+
+
+    def retriever(self, k:int, symbol_index:SymbolIndex=None, paths:List[str]=None) -> List[Document]:
         """
             Retrieves the top k results from a Chroma database using the specified embedding model.
 
+            If a symbol index is given and the active generation has one, identifiers named in the question are resolved
+            through the symbol table and the top hits are expanded with the definitions they reference (still at most k results).
+
+            If paths are given (file paths, directory prefixes or globs relative to the repository), the search is restricted to
+            them by a metadata filter applied inside the vector search.
+
             Args:
                 k (int): The number of top results to retrieve.
+                symbol_index (SymbolIndex): Optional symbol index used to expand the similarity search.
+                paths (list): Optional path prefixes or globs the search is restricted to.
 
             Returns:
                 object: An object that contains the top k results from the Chroma database.
@@ -157,14 +486,35 @@ class StoreEmbeddings:
                 Exception: If an error occurs during the retrieval process.
         """
         try:
-            self.persist_directory = self.config.chromadb_dir # get the path of chromadb.
+            self.persist_directory = KnowledgeBaseGenerations(config=self.config).get_active_dir() # get the path of the active chromadb generation.
             log(file_object=self.log_file, log_message=f"get the chromadb path i.e. '{self.persist_directory}'") # logs the message
 
-            self.vectordb = Chroma(persist_directory=self.persist_directory, embedding_function=self.load_embedding_model()) # get the vectordb
-
-            self.retriever = self.vectordb.as_retriever(search_kwargs={"k": k}) # retrieve top k information
+            self.vectordb = _VECTORDBS.get(self.persist_directory)
+            if self.vectordb is None: # generations never change once promoted, so an opened chromadb is reused
+                _RETIRED_VECTORDBS.update((path, time.time()) for path in _VECTORDBS) # in-flight readers keep their own reference for now
+                _VECTORDBS.clear()
+                _RETIRED_VECTORDBS.pop(self.persist_directory, None)
+                self.vectordb = _VECTORDBS[self.persist_directory] = Chroma(persist_directory=self.persist_directory, embedding_function=self.load_embedding_model()) # get the vectordb
+            self.release_retired_generations()
+
+            search_kwargs, scope = {"k": k}, None
+            if paths:
+                known_paths = read_json_file(file_path=os.path.join(self.persist_directory, PATHS_FILE))
+                if known_paths is None:
+                    raise ValueError("the knowledgebase was built without path metadata, rebuild it to scope questions to paths")
+                scope = PathScope(patterns=paths, known_paths=known_paths)
+                if scope.where is not None: # None when the paths select the whole repository
+                    search_kwargs["filter"] = scope.where # filtered inside the vector search
+                log(file_object=self.log_file, log_message=f"scope the retrieval to {scope.patterns}") # logs the message
+
+            self.retriever = self.vectordb.as_retriever(search_kwargs=search_kwargs) # retrieve top k information
             log(file_object=self.log_file, log_message=f"retrieve the top k reseult from chromadb") # logs the message
 
+            if symbol_index is not None and symbol_index.load(generation_dir=self.persist_directory):
+                self.retriever = SymbolExpandedRetriever(vector_retriever=self.retriever, symbol_index=symbol_index, k=k, scope=scope,
+                                                         max_direct=symbol_index.config.max_direct, max_expansions=symbol_index.config.max_expansions) # symbol lookup & call-graph expansion
+                log(file_object=self.log_file, log_message=f"expand the retrieval with the symbol index of '{self.persist_directory}'") # logs the message
+
             return self.retriever # return retriever
 
         except Exception as ex:
@@ -42,7 +42,32 @@ class ConfigManager:
                 overlap=self.params.embeddings.overlap,
                 embedding_model_name=self.config.model.embedding_model,
                 github_dir=self.config.artifacts.data.github_data,
-                chromadb_dir=self.config.artifacts.vectordb.chromadb_dir
+                chromadb_dir=self.config.artifacts.vectordb.chromadb_dir,
+                grace_period=self.params.vectordb.grace_period,
+                smoke_query=self.params.vectordb.smoke_query,
+                checkpoint_file=self.config.artifacts.vectordb.checkpoint_file,
+                peak_rss_mb=self.params.indexing.peak_rss_mb,
+                min_batch_size=self.params.indexing.min_batch_size,
+                max_batch_size=self.params.indexing.max_batch_size,
+                embedding_backend=self.params.embeddings.backend,
+                onnx_config=OnnxEmbeddingConfig(
+                    model_name=self.config.model.embedding_model,
+                    cache_dir=self.config.artifacts.models.onnx_cache_dir,
+                    quantize=self.params.embeddings.onnx.quantize,
+                    num_threads=self.params.embeddings.onnx.num_threads,
+                    max_length=self.params.embeddings.onnx.max_length,
+                    batch_size=self.params.embeddings.onnx.batch_size,
+                    parity_threshold=self.params.embeddings.onnx.parity_threshold
+                ),
+                embedding_service=EmbeddingServiceConfig(
+                    enabled=self.params.embedding_service.enabled,
+                    socket_path=self.config.artifacts.embedding_service.socket_path or "",
+                    host=self.config.artifacts.embedding_service.host,
+                    port=self.config.artifacts.embedding_service.port,
+                    max_batch_size=self.params.embedding_service.max_batch_size,
+                    max_wait_ms=self.params.embedding_service.max_wait_ms,
+                    timeout=self.params.embedding_service.timeout
+                )
             )
             return store_embedding_vectordb_config
 
@@ -50,6 +75,64 @@ class ConfigManager:
             raise ex
     
 
+    def get_symbol_index_config(self) -> SymbolIndexConfig:
+        """
+            Returns an instance of the `SymbolIndexConfig` class with its attributes set based on the values obtained from the `params` and `config` files.
+
+            :return: An instance of the `SymbolIndexConfig` class.
+        """
+        try:
+            symbol_index_config = SymbolIndexConfig(
+                github_dir=self.config.artifacts.data.github_data,
+                max_snippet_chars=self.params.symbols.max_snippet_chars,
+                max_direct=self.params.symbols.max_direct,
+                max_expansions=self.params.symbols.max_expansions
+            )
+            return symbol_index_config
+
+        except Exception as ex:
+            raise ex
+
+
+    def get_repo_summary_config(self) -> RepoSummaryConfig:
+        """
+            Returns an instance of the `RepoSummaryConfig` class with its attributes set based on the values obtained from the `params` and `config` files.
+
+            :return: An instance of the `RepoSummaryConfig` class.
+        """
+        try:
+            repo_summary_config = RepoSummaryConfig(
+                enabled=self.params.summaries.enabled,
+                github_dir=self.config.artifacts.data.github_data,
+                cache_file=self.config.artifacts.summaries.cache_file,
+                max_concurrency=self.params.summaries.max_concurrency,
+                max_file_chars=self.params.summaries.max_file_chars,
+                max_prompt_chars=self.params.summaries.max_prompt_chars
+            )
+            return repo_summary_config
+
+        except Exception as ex:
+            raise ex
+
+
+    def get_knowledgebase_snapshot_config(self) -> KnowledgeBaseSnapshotConfig:
+        """
+            Returns an instance of the `KnowledgeBaseSnapshotConfig` class with its attributes set based on the values obtained from the `params` and `config` files.
+
+            :return: An instance of the `KnowledgeBaseSnapshotConfig` class.
+        """
+        try:
+            knowledgebase_snapshot_config = KnowledgeBaseSnapshotConfig(
+                snapshots_dir=self.config.artifacts.snapshots.snapshots_dir,
+                embedding_model_name=self.config.model.embedding_model,
+                batch_size=self.params.snapshots.batch_size
+            )
+            return knowledgebase_snapshot_config
+
+        except Exception as ex:
+            raise ex
+
+
     def get_llm_config(self) -> LLMConfig:
         """
             Returns an instance of the LLMConfig class with its attributes set based on the values obtained from the params and config files.
@@ -71,6 +154,103 @@ class ConfigManager:
             raise ex
 
 
+
+    def get_fast_answer_config(self) -> FastAnswerConfig:
+        """
+            Returns an instance of the FastAnswerConfig class with its attributes set based on the values obtained from the params file.
+
+            :return: An instance of the FastAnswerConfig class.
+            :rtype: FastAnswerConfig
+        """
+        try:
+            fast_answer_config = FastAnswerConfig(
+                k=self.params.fast_answer.k,
+                max_excerpt_lines=self.params.fast_answer.max_excerpt_lines
+            )
+            return fast_answer_config
+
+        except Exception as ex:
+            raise ex
+
+
+
+    def get_cache_warmup_config(self) -> CacheWarmupConfig:
+        """
+            Returns an instance of the CacheWarmupConfig class with its attributes set based on the values obtained from the params and config files.
+
+            :return: An instance of the CacheWarmupConfig class.
+            :rtype: CacheWarmupConfig
+        """
+        try:
+            cache_warmup_config = CacheWarmupConfig(
+                enabled=self.params.warmup.enabled,
+                chat_file=self.config.artifacts.chatdata,
+                max_questions=self.params.warmup.max_questions,
+                concurrency=self.params.warmup.concurrency,
+                llm_budget=self.params.warmup.llm_budget
+            )
+            return cache_warmup_config
+
+        except Exception as ex:
+            raise ex
+
+
+
+    def get_repo_scan_config(self) -> RepoScanConfig:
+        """
+            Returns an instance of the RepoScanConfig class with its attributes set based on the values obtained from the params and config files.
+
+            :return: An instance of the RepoScanConfig class.
+            :rtype: RepoScanConfig
+        """
+        try:
+            repo_scan_config = RepoScanConfig(
+                github_dir=self.config.artifacts.data.github_data,
+                report_file=self.config.artifacts.data.scan_report,
+                suffixes=list(self.params.scan.suffixes),
+                ignore_patterns=list(self.params.scan.ignore_patterns),
+                max_file_bytes=self.params.scan.max_file_bytes,
+                max_line_length=self.params.scan.max_line_length,
+                max_avg_line_length=self.params.scan.max_avg_line_length,
+                chunk_size=self.params.embeddings.chunk_zise,
+                overlap=self.params.embeddings.overlap,
+                chunks_per_second=self.params.scan.chunks_per_second,
+                max_files=self.params.scan.max_files,
+                max_bytes=self.params.scan.max_bytes,
+                max_chunks=self.params.scan.max_chunks
+            )
+            return repo_scan_config
+
+        except Exception as ex:
+            raise ex
+
+
+    def get_profiling_config(self) -> ProfilingConfig:
+        """
+            Returns an instance of the ProfilingConfig class with its attributes set based on the values obtained from the params and config files.
+
+            The admin token is read from the PROFILING_ADMIN_TOKEN environment variable.
+
+            :return: An instance of the ProfilingConfig class.
+            :rtype: ProfilingConfig
+        """
+        try:
+            profiling_config = ProfilingConfig(
+                enabled=self.params.profiling.enabled,
+                admin_token=os.getenv("PROFILING_ADMIN_TOKEN", ""),
+                profiles_dir=self.config.artifacts.profiles.profiles_dir,
+                sample_interval=self.params.profiling.sample_interval,
+                max_seconds=self.params.profiling.max_seconds,
+                max_stack_depth=self.params.profiling.max_stack_depth,
+                memory_frames=self.params.profiling.memory_frames,
+                max_snapshots=self.params.profiling.max_snapshots,
+                top_stats=self.params.profiling.top_stats
+            )
+            return profiling_config
+
+        except Exception as ex:
+            raise ex
+
         
 
 
@@ -1,5 +1,5 @@
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 
 
@@ -15,6 +15,52 @@ class GithubUrlIngestionConfig:
     github_dir: Path
 
 
+@dataclass(frozen=True)
+class OnnxEmbeddingConfig:
+    """
+        Represents the configuration for running the embedding model with onnxruntime.
+
+        Attributes:
+            model_name (str): The sentence-transformers model to be exported.
+            cache_dir (Path): The directory where the onnx exports are cached.
+            quantize (bool): Whether the export is dynamically quantized to int8.
+            num_threads (int): The onnxruntime intra-op threads, 0 for the number of physical cores.
+            max_length (int): The maximum number of tokens per text.
+            batch_size (int): The number of texts encoded at once.
+            parity_threshold (float): The minimum cosine similarity between onnx & torch vectors to enable the backend.
+    """
+    model_name: str
+    cache_dir: Path
+    quantize: bool
+    num_threads: int
+    max_length: int
+    batch_size: int
+    parity_threshold: float
+
+
+@dataclass(frozen=True)
+class EmbeddingServiceConfig:
+    """
+        Represents the configuration for the local embedding service shared by the web workers.
+
+        Attributes:
+            enabled (bool): Whether the workers use the service (falling back to in-process loading if it is unavailable).
+            socket_path (str): The unix socket of the service, empty to use host & port.
+            host (str): The host of the service when it listens on TCP.
+            port (int): The port of the service when it listens on TCP.
+            max_batch_size (int): The number of texts encoded together by the service, also the most texts a client sends per request.
+            max_wait_ms (int): How long a request waits for other requests to join its batch.
+            timeout (int): The socket timeout in seconds.
+    """
+    enabled: bool
+    socket_path: str
+    host: str
+    port: int
+    max_batch_size: int
+    max_wait_ms: int
+    timeout: int
+
+
 @dataclass(frozen=True)
 class StoreEmbeddingVectorDBConfig:
     """
@@ -26,12 +72,83 @@ class StoreEmbeddingVectorDBConfig:
         - embedding_model_name: A string representing the name of the embedding model.
         - github_dir: A Path object representing the directory where the GitHub data is stored.
         - chromadb_dir: A Path object representing the directory where the ChromaDB data is stored.
+        - grace_period: An integer representing the seconds an old knowledge-base generation is kept after a rebuild.
+        - smoke_query: A string representing the query used to validate a new knowledge base before it is promoted.
+        - checkpoint_file: A Path object representing the file where the indexing checkpoint is stored.
+        - peak_rss_mb: An integer representing the target peak memory (MB) of the indexing process.
+        - min_batch_size: An integer representing the smallest number of chunks embedded & committed at once.
+        - max_batch_size: An integer representing the largest number of chunks embedded & committed at once.
+        - embedding_backend: A string representing the runtime of the embedding model, 'torch' or 'onnx'.
+        - onnx_config: An OnnxEmbeddingConfig object used when the embedding backend is 'onnx'.
+        - embedding_service: An EmbeddingServiceConfig object for the local embedding service.
     """
     chunk_zise: int
     overlap: int
     embedding_model_name: str
     github_dir: Path
     chromadb_dir: Path
+    grace_period: int
+    smoke_query: str
+    checkpoint_file: Path
+    peak_rss_mb: int
+    min_batch_size: int
+    max_batch_size: int
+    embedding_backend: str
+    onnx_config: OnnxEmbeddingConfig
+    embedding_service: EmbeddingServiceConfig
+
+
+@dataclass(frozen=True)
+class SymbolIndexConfig:
+    """
+        Represents the configuration for the symbol table & import/call graph of the python sources.
+
+        Attributes:
+            github_dir (Path): The directory where the GitHub data is stored.
+            max_snippet_chars (int): The longest definition source stored in the symbol index.
+            max_direct (int): The number of definitions of identifiers named in the question added to the retrieved documents.
+            max_expansions (int): The number of referenced definitions added to the retrieved documents.
+    """
+    github_dir: Path
+    max_snippet_chars: int
+    max_direct: int
+    max_expansions: int
+
+
+@dataclass(frozen=True)
+class RepoSummaryConfig:
+    """
+        Represents the configuration for the hierarchical (file, package, repo) summaries.
+
+        Attributes:
+            enabled (bool): Whether the summaries are generated after indexing.
+            github_dir (Path): The directory where the GitHub data is stored.
+            cache_file (Path): The file caching the summaries by content hash.
+            max_concurrency (int): The number of parallel LLM calls.
+            max_file_chars (int): The longest file content sent to summarize a file.
+            max_prompt_chars (int): The longest summary context used to answer an overview question.
+    """
+    enabled: bool
+    github_dir: Path
+    cache_file: Path
+    max_concurrency: int
+    max_file_chars: int
+    max_prompt_chars: int
+
+
+@dataclass(frozen=True)
+class KnowledgeBaseSnapshotConfig:
+    """
+        Represents the configuration for exporting & importing knowledge-base snapshots.
+
+        Attributes:
+            snapshots_dir (Path): The directory where the snapshots are written.
+            embedding_model_name (str): The embedding model the knowledge base must be built with.
+            batch_size (int): The number of chunks read/written at once.
+    """
+    snapshots_dir: Path
+    embedding_model_name: str
+    batch_size: int
 
 
 @dataclass(frozen=True)
@@ -48,4 +165,98 @@ class LLMConfig:
     llm: str
     temperature: float
     max_length: int
-    json_file: Path
\ No newline at end of file
+    json_file: Path
+
+
+@dataclass(frozen=True)
+class FastAnswerConfig:
+    """
+        Represents the configuration for the retrieval-only answer mode (no LLM call).
+
+        Attributes:
+            k (int): The number of source excerpts returned.
+            max_excerpt_lines (int): The maximum number of lines shown per excerpt.
+    """
+    k: int
+    max_excerpt_lines: int
+
+
+@dataclass(frozen=True)
+class CacheWarmupConfig:
+    """
+        Represents the configuration for warming a knowledge base after it was built.
+
+        Attributes:
+            enabled (bool): Whether the knowledge base is warmed after every successful build.
+            chat_file (Path): The chat history json file the questions are mined from.
+            max_questions (int): The number of questions warmed.
+            concurrency (int): The number of questions warmed at once.
+            llm_budget (int): The number of answers precomputed with the LLM.
+    """
+    enabled: bool
+    chat_file: Path
+    max_questions: int
+    concurrency: int
+    llm_budget: int
+
+
+@dataclass(frozen=True)
+class RepoScanConfig:
+    """
+        Represents the configuration for the pre-ingestion scan of the repository.
+
+        Attributes:
+            github_dir (Path): The directory where the GitHub data is stored.
+            report_file (Path): The json file the scan report is written to.
+            suffixes (list): The file suffixes that are ingested.
+            ignore_patterns (list): The glob patterns of the paths that are never ingested.
+            max_file_bytes (int): Larger files are skipped.
+            max_line_length (int): A longer line marks a file as minified.
+            max_avg_line_length (int): A larger average line length marks a file as minified.
+            chunk_size (int): The chunk size, used to estimate the chunks.
+            overlap (int): The chunk overlap, used to estimate the chunks.
+            chunks_per_second (float): The embedding throughput, used to estimate the embedding time.
+            max_files (int): The maximum number of files of a repository.
+            max_bytes (int): The maximum number of bytes of a repository.
+            max_chunks (int): The maximum number of estimated chunks of a repository.
+    """
+    github_dir: Path
+    report_file: Path
+    suffixes: list
+    ignore_patterns: list
+    max_file_bytes: int
+    max_line_length: int
+    max_avg_line_length: int
+    chunk_size: int
+    overlap: int
+    chunks_per_second: float
+    max_files: int
+    max_bytes: int
+    max_chunks: int
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    """
+        Represents the configuration of the admin-only profiling endpoints.
+
+        Attributes:
+            enabled (bool): Whether the profiling endpoints & hooks are registered at all.
+            admin_token (str): The token expected in the X-Admin-Token header, profiling stays off without it.
+            profiles_dir (Path): The directory the per-request profiles are written to.
+            sample_interval (float): The seconds between two stack samples of the CPU profiler.
+            max_seconds (float): The longest CPU profiling run.
+            max_stack_depth (int): The deepest stack recorded by the CPU profiler.
+            memory_frames (int): The frames stored per allocation by tracemalloc.
+            max_snapshots (int): The number of tracemalloc snapshots kept in memory.
+            top_stats (int): The number of allocation sites reported.
+    """
+    enabled: bool
+    admin_token: str = field(repr=False) # never printed with the config
+    profiles_dir: Path
+    sample_interval: float
+    max_seconds: float
+    max_stack_depth: int
+    memory_frames: int
+    max_snapshots: int
+    top_stats: int
@@ -2,7 +2,13 @@ from chatwithcode.utils.common_utils import log, create_dir, clean_prev_dirs_if_
 from chatwithcode.config.configuration import ConfigManager
 from chatwithcode.components.data_ingestion import DataIngestion
 from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
-from chatwithcode.components.generate_answer import GenerateResponse
+from chatwithcode.components.generate_answer import GenerateResponse, is_lookup_question
+from chatwithcode.components.knowledgebase_snapshot import KnowledgeBaseSnapshot
+from chatwithcode.components.symbol_index import SymbolIndex
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations
+from chatwithcode.components.repo_summaries import RepoSummarizer, is_overview_question
+from chatwithcode.components.cache_warmer import CacheWarmer
+from chatwithcode.components.repo_scan import RepoScanner
 import os
 
 
@@ -34,14 +40,35 @@ class ChatWithCode:
 
             self.ingestion = DataIngestion(config=self.github_url_ingestion_confg) # initialize the DataIngestion class
             self.ingestion.get_data(url=url)
+            self.source = {"url": url, "commit": self.ingestion.get_commit()} # identifies the build, used to resume it
 
+            # Scan the repository: skip junk files, estimate the cost & reject it (RepoBudgetExceeded) before any embedding:
+            self.scanner = RepoScanner(config=self.config_manager.get_repo_scan_config()) # initialize the class
+            self.scan_report = self.scanner.scan()
+            self.skip_paths = set(self.scan_report["skipped"])
 
-            # Step 2: Create KnowledgeBase:
+
+            # Step 2: Create KnowledgeBase (load, chunk & embed file by file in batches, resumable from the checkpoint):
             self.store_embedding_vectordb_config = self.config_manager.get_store_embedding_vectordb_config() # get the embedding configuration
             self.emb = StoreEmbeddings(config=self.store_embedding_vectordb_config) # initialize the class
-            self.documents = self.emb.get_documents() # load data from given github directory
-            self.chunks = self.emb.create_chunks(documents=self.documents) # create chunks of documents
-            self.emb.create_knowledgebase(chunks=self.chunks) # create knowledgebase (store embedding to chromadb)
+            self.symbol_index = SymbolIndex(config=self.config_manager.get_symbol_index_config()) # symbol table & import/call graph
+            self.emb.build_knowledgebase(source=self.source, symbol_index=self.symbol_index, skip_paths=self.skip_paths) # create knowledgebase (store embedding to chromadb)
+
+
+            # Step 3 (optional): Summarize files, packages & repo for overview questions (cached by content hash):
+            self.repo_summary_config = self.config_manager.get_repo_summary_config() # get the summary configuration
+            if self.repo_summary_config.enabled:
+                try:
+                    self.summarizer = RepoSummarizer(config=self.repo_summary_config, llm=GenerateResponse(config=self.config_manager.get_llm_config()).load_llm())
+                    self.summarizer.summarize(generation_dir=KnowledgeBaseGenerations(config=self.store_embedding_vectordb_config).get_active_dir(), skip_paths=self.skip_paths)
+                except Exception as ex:
+                    log(file_object=self.log_file, log_message=f"summaries not generated, overview questions use the retrieval: {ex}") # the knowledge base is already live
+
+
+            # Step 4: Warm the new knowledge base with the questions asked about this repo (background thread):
+            self.cache_warmup_config = self.config_manager.get_cache_warmup_config() # get the warm-up configuration
+            if self.cache_warmup_config.enabled:
+                self.start_warmup(repo=url)
 
             return "Successfully !!!"
 
@@ -50,12 +77,90 @@ class ChatWithCode:
             raise ex
 
 
-    def predict(self, question:str):
+    def start_warmup(self, repo:str):
+        """
+            Warm the active knowledge base on a background thread: run the retrieval of the most frequent & most recent questions
+            of the repo from the chat history, and precompute the answers of the top ones within the configured LLM budget.
+
+            Args:
+                repo (str): The URL of the GitHub repository the knowledge base was built from.
+
+            Returns:
+                threading.Thread: The warm-up thread.
+        """
+        try:
+            store_embedding_vectordb_config = self.config_manager.get_store_embedding_vectordb_config() # get the embedding configuration
+            symbol_index_config = self.config_manager.get_symbol_index_config() # get the symbol index configuration
+            cache_warmup_config = self.config_manager.get_cache_warmup_config() # get the warm-up configuration
+            response = GenerateResponse(config=self.config_manager.get_llm_config(), repo=repo)
+
+            # a new StoreEmbeddings per call: `retriever` replaces itself on the instance it is called on
+            retriever_factory = lambda: StoreEmbeddings(config=store_embedding_vectordb_config).retriever(k=15, symbol_index=SymbolIndex(config=symbol_index_config))
+            qa_chain_factory = (lambda: response.qa_llm(retriever=retriever_factory())) if cache_warmup_config.llm_budget > 0 else None
+
+            self.cache_warmer = CacheWarmer(config=cache_warmup_config) # initialize the class
+            return self.cache_warmer.start(repo=repo, generation_dir=KnowledgeBaseGenerations(config=store_embedding_vectordb_config).get_active_dir(),
+                                           retriever_factory=retriever_factory, qa_chain_factory=qa_chain_factory)
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}")
+            raise ex
+
+
+    def export_snapshot(self) -> str:
+        """
+            Export the active knowledge base into a portable snapshot (vectors, chunk text, metadata, embedding model & source commit).
+
+            Returns:
+                str: The path of the snapshot.
+
+            Raises:
+                Exception: If an error occurs during the export.
+        """
+        try:
+            self.snapshot = KnowledgeBaseSnapshot(config=self.config_manager.get_knowledgebase_snapshot_config(),
+                                                  vectordb_config=self.config_manager.get_store_embedding_vectordb_config()) # initialize the class
+            return self.snapshot.export_snapshot()
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}")
+            raise ex
+
+
+    def import_snapshot(self, snapshot_dir:str) -> str:
+        """
+            Load a snapshot built elsewhere as the active knowledge base, without cloning or embedding the repository.
+
+            Args:
+                snapshot_dir (str): The path of the snapshot.
+
+            Returns:
+                str: The id of the promoted knowledge-base generation.
+
+            Raises:
+                Exception: If the snapshot is invalid or an error occurs during the import.
+        """
+        try:
+            self.snapshot = KnowledgeBaseSnapshot(config=self.config_manager.get_knowledgebase_snapshot_config(),
+                                                  vectordb_config=self.config_manager.get_store_embedding_vectordb_config()) # initialize the class
+            return self.snapshot.import_snapshot(snapshot_dir=snapshot_dir)
+
+        except Exception as ex:
+            log(file_object=self.log_file, log_message=f"Error occurred: {ex}")
+            raise ex
+
+
+    ANSWER_MODES = ("auto", "llm", "retrieval")
+
+    def predict(self, question:str, mode:str="auto", paths:list=None):
         """
             Generates a response to a given question.
 
             Args:
                 question (str): The question for which the answer is to be generated.
+                mode (str): 'llm' always asks the LLM, 'retrieval' returns the ranked source excerpts without the LLM,
+                            'auto' picks 'retrieval' for "where is X defined?" / "show me the code for Y" questions.
+                paths (list): Optional path prefixes or globs (relative to the repository) the question is restricted to.
 
             Returns:
                 str: The generated answer to the given question.
@@ -64,13 +169,42 @@ class ChatWithCode:
                 Exception: If an error occurs during the prediction process.
         """
         try:
+            if mode not in self.ANSWER_MODES:
+                raise ValueError(f"unknown answer mode '{mode}', expected one of {self.ANSWER_MODES}")
+
             self.store_embedding_vectordb_config = self.config_manager.get_store_embedding_vectordb_config() # get the embedding configuration
             self.emb = StoreEmbeddings(config=self.store_embedding_vectordb_config) # initialize the class
 
-            # Step 1: Get the QA Chain
+            self.generations = KnowledgeBaseGenerations(config=self.store_embedding_vectordb_config)
+            self.generation_dir = self.generations.get_active_dir() # the knowledge base answering this question
+            self.repo = self.generations.get_active_metadata().get("source", {}).get("url")
+
             self.llm_config = self.config_manager.get_llm_config() # get the llm configuration
-            self.response = GenerateResponse(config=self.llm_config) # initialize the class
-            self.qa_chain = self.response.qa_llm(retriever=self.emb.retriever(k=15)) # get the chain for generate the answers
+            self.response = GenerateResponse(config=self.llm_config, repo=self.repo) # initialize the class
+
+            self.symbol_index = SymbolIndex(config=self.config_manager.get_symbol_index_config()) # resolve identifiers named in the question
+
+            # Lookup questions are answered with the source excerpts only, without the LLM round trip:
+            if mode == "retrieval" or (mode == "auto" and is_lookup_question(question)):
+                self.fast_answer_config = self.config_manager.get_fast_answer_config() # get the fast answer configuration
+                return self.response.generate_retrieval_response(retriever=self.emb.retriever(k=self.fast_answer_config.k, symbol_index=self.symbol_index, paths=paths),
+                                                                 question=question, max_excerpt_lines=self.fast_answer_config.max_excerpt_lines)
+
+            # Answers precomputed by the warm-up after the last build ('llm' always asks the LLM):
+            if mode == "auto" and not paths:
+                self.cached_answer = CacheWarmer(config=self.config_manager.get_cache_warmup_config()).cached_answer(generation_dir=self.generation_dir, question=question)
+                if self.cached_answer:
+                    return self.response.store_answer(question=question, answer=self.cached_answer, mode="cached")
+
+            # Overview questions are answered from the precomputed summaries with one small prompt:
+            if mode == "auto" and not paths and is_overview_question(question):
+                self.summarizer = RepoSummarizer(config=self.config_manager.get_repo_summary_config(), llm=None)
+                self.summaries = self.summarizer.load(generation_dir=self.generation_dir)
+                if self.summaries and self.summaries["repo"]:
+                    return self.response.generate_overview_response(context=self.summarizer.overview_context(self.summaries), question=question)
+
+            # Step 1: Get the QA Chain
+            self.qa_chain = self.response.qa_llm(retriever=self.emb.retriever(k=15, symbol_index=self.symbol_index, paths=paths)) # get the chain for generate the answers
 
             # Step 2: Generate the Answer based on question:
             self.result = self.response.generate_response(qa_chain=self.qa_chain, question=question) # get the relevant result from the cgiven context
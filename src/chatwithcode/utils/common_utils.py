@@ -2,7 +2,6 @@ import os
 import shutil
 import json
 import yaml
-import torch
 from pathlib import Path
 from box.exceptions import BoxValueError
 from box import ConfigBox
@@ -123,4 +122,80 @@ def insert_data_tojson_file(file_path:Path, data_dct:dict):
                 json.dump(data, file, indent=4) 
 
     except Exception as e:
-        raise e
\ No newline at end of file
+        raise e
+
+
+def read_json_file(file_path:Path, default:Any=None) -> Any:
+    """
+        Read a JSON file and return its contents, or the given default if the file does not exist.
+
+        Args:
+            file_path (Path): The path of the JSON file.
+            default (Any): The value returned when the file is missing.
+
+        Returns:
+            Any: The parsed JSON data.
+
+        Raises:
+            Exception: If an error occurs while reading the file.
+    """
+    try:
+        if not os.path.exists(file_path):
+            return default
+        with open(file_path, 'r') as file:
+            return json.load(file)
+
+    except Exception as e:
+        raise e
+
+
+def write_json_file_atomic(file_path:Path, data:Any) -> None:
+    """
+        Write data to a JSON file atomically, readers either see the old file or the new one, never a partial write.
+
+        Args:
+            file_path (Path): The path of the JSON file.
+            data (Any): The JSON serializable data to be written.
+
+        Raises:
+            Exception: If an error occurs while writing the file.
+    """
+    try:
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path) # atomic rename on both posix & windows
+
+    except Exception as e:
+        raise e
+
+
+def get_memory_usage_mb() -> float:
+    """
+        Returns the resident set size (RSS) of the current process in MB.
+
+        Uses psutil when it is installed, otherwise /proc/self/statm (linux) or the peak RSS reported by the resource module.
+
+        Returns:
+            float: The RSS of the current process in MB, or 0.0 if it cannot be determined.
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm") as file:
+            rss_pages = int(file.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # peak RSS (KB on linux)
+    except ImportError:
+        return 0.0
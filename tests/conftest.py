@@ -0,0 +1,60 @@
+import os
+import shutil
+import sys
+import pytest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+sys.path.insert(0, ROOT_DIR) # app.py
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """
+        Runs every test in its own directory, the components write their logs to logs/logs.log relative to it.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("logs", exist_ok=True)
+    return tmp_path
+
+
+def write_files(root, files:dict) -> None:
+    """
+        Creates the given {relative path: content} files under root.
+    """
+    for path, content in files.items():
+        file_path = os.path.join(str(root), path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            file.write(content)
+
+
+@pytest.fixture
+def project(workdir):
+    """
+        Copies config.yaml & params.yaml into the working directory (with an empty secret file), so ConfigManager & the
+        pipeline read the repository configuration and write their artifacts under the test directory.
+    """
+    os.makedirs("config", exist_ok=True)
+    os.makedirs(os.path.join("artifacts", "qa"), exist_ok=True) # the chat history directory is part of the repository
+    shutil.copy(os.path.join(ROOT_DIR, "config", "config.yaml"), os.path.join("config", "config.yaml"))
+    shutil.copy(os.path.join(ROOT_DIR, "params.yaml"), "params.yaml")
+    with open(os.path.join("config", "secrect.yaml"), 'w') as file:
+        file.write("{}\n")
+    return workdir
+
+
+def make_vectordb_config(workdir, **overrides):
+    """
+        Returns a StoreEmbeddingVectorDBConfig writing everything under workdir, with batches of one chunk.
+    """
+    from chatwithcode.entity.config_entity import StoreEmbeddingVectorDBConfig, EmbeddingServiceConfig
+    settings = dict(
+        chunk_zise=500, overlap=0, embedding_model_name="fake", github_dir=str(workdir / "github"),
+        chromadb_dir=str(workdir / "chromadb"), grace_period=0, smoke_query="def", checkpoint_file=str(workdir / "checkpoint.json"),
+        peak_rss_mb=1_000_000, min_batch_size=1, max_batch_size=1, embedding_backend="torch", onnx_config=None,
+        embedding_service=EmbeddingServiceConfig(enabled=False, socket_path="", host="127.0.0.1", port=0, max_batch_size=1, max_wait_ms=0, timeout=1)
+    )
+    settings.update(overrides)
+    return StoreEmbeddingVectorDBConfig(**settings)
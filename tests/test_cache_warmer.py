@@ -0,0 +1,52 @@
+from chatwithcode.entity.config_entity import CacheWarmupConfig
+from chatwithcode.components.cache_warmer import CacheWarmer, normalize_question
+from chatwithcode.components.generate_answer import GenerateResponse
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from chatwithcode.utils.common_utils import write_json_file_atomic
+from chatwithcode.pipeline.chat_with_code import ChatWithCode
+import pytest
+
+
+REPO = "https://github.com/example/repo.git"
+
+
+@pytest.fixture
+def warmer(workdir):
+    history = [{"repo": REPO, "question": question} for question in (
+        "What is data ingestion?", "what is data ingestion", "How are chunks stored?", "What is data ingestion?!",
+        "How are chunks stored", "Where is load defined?", "Explain the retriever",
+    )]
+    history.insert(2, {"repo": "https://github.com/example/other.git", "question": "Unrelated question?"})
+    history.append({"repo": REPO, "question": ""})
+    write_json_file_atomic(file_path=str(workdir / "chat.json"), data=history)
+    return CacheWarmer(config=CacheWarmupConfig(enabled=True, chat_file=str(workdir / "chat.json"), max_questions=4, concurrency=1, llm_budget=1))
+
+
+def test_normalize_question():
+    assert normalize_question("  What   is Data Ingestion?! ") == "what is data ingestion"
+
+
+def test_mine_questions_by_frequency_then_recency(warmer):
+    assert warmer.mine_questions(repo=REPO) == [
+        "What is data ingestion?!", # most frequent, asked in its latest wording
+        "How are chunks stored",
+        "Explain the retriever", # then the most recent ones
+        "Where is load defined?",
+    ]
+    assert warmer.mine_questions(repo="https://github.com/example/unknown.git") == []
+
+
+def test_cached_answer(warmer, workdir):
+    write_json_file_atomic(file_path=str(workdir / CacheWarmer.ANSWERS_FILE), data={"what is data ingestion": "cloning the repo"})
+    assert warmer.cached_answer(generation_dir=str(workdir), question="What is Data Ingestion?") == "cloning the repo"
+    assert warmer.cached_answer(generation_dir=str(workdir), question="Something else?") is None
+
+
+@pytest.mark.parametrize("mode, paths, expected", [("auto", None, "cached"), ("llm", None, "llm"), ("auto", ["src"], "llm")])
+def test_predict_serves_precomputed_answers_in_auto_mode_only(project, monkeypatch, mode, paths, expected):
+    monkeypatch.setattr(CacheWarmer, "cached_answer", lambda self, generation_dir, question: "cached")
+    monkeypatch.setattr(StoreEmbeddings, "retriever", lambda self, **kwargs: None)
+    monkeypatch.setattr(GenerateResponse, "qa_llm", lambda self, retriever: None)
+    monkeypatch.setattr(GenerateResponse, "generate_response", lambda self, qa_chain, question: "llm")
+
+    assert ChatWithCode().predict(question="How are chunks stored?", mode=mode, paths=paths) == expected
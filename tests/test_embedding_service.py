@@ -0,0 +1,142 @@
+from chatwithcode.entity.config_entity import EmbeddingServiceConfig
+from chatwithcode.components import embedding_service
+from chatwithcode.components.embedding_service import EmbeddingServiceClient, MicroBatcher, _EmbeddingRequestHandler, get_embedding_service_client
+from langchain_core.embeddings import Embeddings
+import socketserver
+import threading
+import socket
+import time
+import pytest
+import os
+
+
+class _CountingEmbeddings(Embeddings):
+    def __init__(self, delay:float=0) -> None:
+        self.delay = delay
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _serve(socket_path:str, embeddings:Embeddings, model_name:str="fake"):
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _EmbeddingRequestHandler)
+    server.daemon_threads = True
+    server.model_name = model_name
+    server.batcher = MicroBatcher(embeddings=embeddings, max_batch_size=4, max_wait_ms=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _config(workdir, timeout:float) -> EmbeddingServiceConfig:
+    return EmbeddingServiceConfig(enabled=True, socket_path=str(workdir / "emb.sock"), host="", port=0,
+                                  max_batch_size=4, max_wait_ms=0, timeout=timeout)
+
+
+def test_large_inputs_are_sent_in_pieces(workdir):
+    embeddings = _CountingEmbeddings()
+    server = _serve(str(workdir / "emb.sock"), embeddings)
+    try:
+        texts = ["x" * length for length in range(10)]
+        vectors = EmbeddingServiceClient(config=_config(workdir, timeout=5)).embed_documents(texts)
+
+        assert vectors == [[float(length)] for length in range(10)]
+        assert [len(call) for call in embeddings.calls] == [4, 4, 2]
+    finally:
+        server.shutdown()
+
+
+def test_timeouts_are_not_retried(workdir):
+    embeddings = _CountingEmbeddings(delay=1)
+    server = _serve(str(workdir / "emb.sock"), embeddings)
+    try:
+        client = EmbeddingServiceClient(config=_config(workdir, timeout=0.2))
+        with pytest.raises(TimeoutError):
+            client.embed_documents(["slow"])
+        time.sleep(1.5)
+
+        assert len(embeddings.calls) == 1 # sent once, not re-sent after the timeout
+        assert client.sock is None
+    finally:
+        server.shutdown()
+
+
+def test_reset_connections_are_retried(workdir):
+    embeddings = _CountingEmbeddings()
+    server = _serve(str(workdir / "emb.sock"), embeddings)
+    try:
+        client = EmbeddingServiceClient(config=_config(workdir, timeout=5))
+        assert client.ping()["model"] == "fake"
+        client.sock.shutdown(2) # the connection is gone (e.g. the service restarted)
+
+        assert client.embed_documents(["abc"]) == [[3.0]]
+    finally:
+        server.shutdown()
+
+
+def _stop(server, client) -> None:
+    """
+        Stops the service like a crashed sidecar: no listener, no socket file, and the open connection is gone.
+    """
+    server.shutdown()
+    server.server_close()
+    os.unlink(server.server_address)
+    if client.sock is not None:
+        client.sock.shutdown(socket.SHUT_RDWR)
+
+
+def test_cached_client_falls_back_per_call_and_returns_to_the_service(workdir, monkeypatch):
+    monkeypatch.setattr(embedding_service, "_CLIENTS", {})
+    local, loads = _CountingEmbeddings(), []
+    def local_factory():
+        loads.append(1)
+        return local
+
+    server = _serve(str(workdir / "emb.sock"), _CountingEmbeddings())
+    client = get_embedding_service_client(config=_config(workdir, timeout=5), model_name="fake", local_factory=local_factory)
+    assert client.embed_query("abc") == [3.0]
+    assert loads == [] # the in-process model is only loaded when needed
+
+    _stop(server, client)
+    cached = get_embedding_service_client(config=_config(workdir, timeout=5), model_name="fake", local_factory=local_factory)
+    assert cached is client
+    assert cached.embed_query("abcd") == [4.0]
+    assert cached.embed_query("abcde") == [5.0]
+    assert loads == [1] and len(local.calls) == 2
+
+    server = _serve(str(workdir / "emb.sock"), _CountingEmbeddings())
+    try:
+        assert cached.embed_query("ab") == [2.0]
+        assert len(local.calls) == 2 # back on the service
+    finally:
+        server.shutdown()
+
+
+def test_client_falls_back_when_the_service_serves_another_model(workdir, monkeypatch):
+    monkeypatch.setattr(embedding_service, "_CLIENTS", {})
+    local = _CountingEmbeddings()
+    server = _serve(str(workdir / "emb.sock"), _CountingEmbeddings(), model_name="other")
+    try:
+        client = get_embedding_service_client(config=_config(workdir, timeout=5), model_name="fake", local_factory=lambda: local)
+        assert client.embed_query("abc") == [3.0]
+        assert local.calls == [["abc"]]
+    finally:
+        server.shutdown()
+
+
+def test_timeouts_do_not_fall_back(workdir, monkeypatch):
+    monkeypatch.setattr(embedding_service, "_CLIENTS", {})
+    local = _CountingEmbeddings()
+    server = _serve(str(workdir / "emb.sock"), _CountingEmbeddings(delay=1))
+    try:
+        client = get_embedding_service_client(config=_config(workdir, timeout=0.2), model_name="fake", local_factory=lambda: local)
+        with pytest.raises(TimeoutError):
+            client.embed_query("slow")
+        assert local.calls == []
+    finally:
+        server.shutdown()
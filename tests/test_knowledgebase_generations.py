@@ -0,0 +1,92 @@
+from chatwithcode.components import vectordb_embeddings
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from chromadb.api.client import SharedSystemClient
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+from conftest import make_vectordb_config
+import os
+import time
+import pytest
+
+
+@pytest.fixture
+def generations(workdir):
+    return KnowledgeBaseGenerations(config=make_vectordb_config(workdir, grace_period=60))
+
+
+def build(generations) -> str:
+    generation_id = generations.create_staging()
+    Chroma.from_documents(documents=[Document(page_content="def main(): pass", metadata={"path": "main.py"})],
+                          embedding=DeterministicFakeEmbedding(size=8), persist_directory=generations.generation_path(generation_id))
+    return generation_id
+
+
+def age(generations, generation_id, seconds) -> None:
+    metadata = generations.read_metadata(generation_id)
+    generations.update_metadata(generation_id, **{key: metadata[key] - seconds for key in ("created_at", "retired_at") if key in metadata})
+
+
+def test_promote_swaps_the_pointer_and_retires_the_previous_generation(generations):
+    assert generations.get_active_dir() == generations.root_dir # nothing promoted yet
+
+    first = build(generations)
+    generations.promote(first)
+    second = build(generations)
+    assert generations.get_active_generation() == first # staging builds are invisible
+
+    generations.promote(second)
+    assert generations.get_active_dir() == generations.generation_path(second)
+    assert generations.read_metadata(second)["status"] == "active"
+    assert generations.read_metadata(first)["status"] == "retired"
+
+
+def test_discard_never_removes_the_active_generation(generations):
+    active, broken = build(generations), build(generations)
+    generations.promote(active)
+
+    generations.discard(active)
+    generations.discard(broken)
+
+    assert os.path.isdir(generations.generation_path(active))
+    assert not os.path.exists(generations.generation_path(broken))
+    assert generations.generation_path(broken) not in SharedSystemClient._identifer_to_system
+
+
+def test_cleanup_waits_for_the_grace_period(generations):
+    old, staging, active = build(generations), build(generations), build(generations)
+    generations.promote(old)
+    generations.promote(active)
+
+    assert generations.cleanup() == [] # still within the grace period
+
+    age(generations, old, 120)
+    age(generations, staging, 120)
+    assert generations.cleanup(retired_only=True) == [old]
+    assert old not in os.listdir(generations.generations_dir)
+    assert generations.generation_path(old) not in SharedSystemClient._identifer_to_system
+
+    assert generations.cleanup(keep=[staging]) == []
+    assert generations.cleanup() == [staging]
+    assert os.listdir(generations.generations_dir) == [active]
+
+
+def test_retriever_releases_and_collects_previous_generations(workdir, monkeypatch):
+    config = make_vectordb_config(workdir, grace_period=0)
+    generations = KnowledgeBaseGenerations(config=config)
+    monkeypatch.setattr(StoreEmbeddings, "load_embedding_model", lambda self: DeterministicFakeEmbedding(size=8))
+    monkeypatch.setattr(vectordb_embeddings, "RETIRED_VECTORDB_SECONDS", 0)
+
+    first = build(generations)
+    generations.promote(first)
+    StoreEmbeddings(config=config).retriever(k=1).get_relevant_documents("main")
+
+    second = build(generations)
+    generations.promote(second)
+    time.sleep(0.01)
+    StoreEmbeddings(config=config).retriever(k=1).get_relevant_documents("main")
+
+    assert generations.generation_path(first) not in SharedSystemClient._identifer_to_system
+    assert generations.generation_path(second) in SharedSystemClient._identifer_to_system
+    assert os.listdir(generations.generations_dir) == [second] # collected without a rebuild
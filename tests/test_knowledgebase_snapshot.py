@@ -0,0 +1,91 @@
+from chatwithcode.entity.config_entity import KnowledgeBaseSnapshotConfig
+from chatwithcode.components.knowledgebase_snapshot import KnowledgeBaseSnapshot
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from chatwithcode.components.symbol_index import SymbolIndex
+from chatwithcode.components.path_scope import PATHS_FILE, path_metadata
+from chatwithcode.utils.common_utils import read_json_file, write_json_file_atomic
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+from conftest import make_vectordb_config
+import os
+import pytest
+
+
+PATHS = ["pkg/a.py", "pkg/b.py", "main.py"]
+
+
+@pytest.fixture
+def snapshot(workdir, monkeypatch):
+    """
+        A promoted knowledge base of 3 chunks with its paths & symbols, and a snapshot exporter of it.
+    """
+    monkeypatch.setattr(StoreEmbeddings, "load_embedding_model", lambda self: DeterministicFakeEmbedding(size=8))
+    vectordb_config = make_vectordb_config(workdir, smoke_query="code")
+    generations = KnowledgeBaseGenerations(config=vectordb_config)
+    generation_id = generations.create_staging()
+    generation_dir = generations.generation_path(generation_id)
+    Chroma.from_documents(documents=[Document(page_content=f"code of {path}", metadata=path_metadata(path)) for path in PATHS],
+                          embedding=DeterministicFakeEmbedding(size=8), persist_directory=generation_dir, ids=PATHS)
+    write_json_file_atomic(file_path=os.path.join(generation_dir, PATHS_FILE), data=sorted(PATHS))
+    write_json_file_atomic(file_path=os.path.join(generation_dir, SymbolIndex.SYMBOLS_FILE), data={"definitions": {"main": []}})
+    generations.update_metadata(generation_id, source={"url": "https://github.com/example/repo.git", "commit": "abc123"})
+    generations.promote(generation_id)
+
+    config = KnowledgeBaseSnapshotConfig(snapshots_dir=str(workdir / "snapshots"), embedding_model_name="fake", batch_size=2)
+    return KnowledgeBaseSnapshot(config=config, vectordb_config=vectordb_config)
+
+
+def test_export_import_round_trip(snapshot):
+    exported_id = snapshot.generations.get_active_generation()
+    snapshot_dir = snapshot.export_snapshot()
+
+    manifest = snapshot.verify_snapshot(snapshot_dir=snapshot_dir)
+    assert manifest["chunks"] == 3 and manifest["dim"] == 8 and manifest["generation_id"] == exported_id
+    assert {PATHS_FILE, SymbolIndex.SYMBOLS_FILE} <= set(manifest["files"])
+
+    include = ["embeddings", "documents", "metadatas"]
+    original = Chroma(persist_directory=snapshot.generations.generation_path(exported_id))._collection.get(ids=PATHS, include=include)
+
+    imported_id = snapshot.import_snapshot(snapshot_dir=snapshot_dir)
+    assert imported_id != exported_id
+    assert snapshot.generations.get_active_generation() == imported_id
+
+    generation_dir = snapshot.generations.generation_path(imported_id)
+    assert read_json_file(file_path=os.path.join(generation_dir, PATHS_FILE)) == sorted(PATHS)
+    assert read_json_file(file_path=os.path.join(generation_dir, SymbolIndex.SYMBOLS_FILE)) == {"definitions": {"main": []}}
+
+    imported = Chroma(persist_directory=generation_dir)._collection.get(ids=PATHS, include=include)
+    assert imported["documents"] == original["documents"]
+    assert imported["metadatas"] == original["metadatas"]
+    for vector, expected in zip(imported["embeddings"], original["embeddings"]):
+        assert list(vector) == pytest.approx(list(expected), rel=1e-6)
+
+
+def test_import_rejects_a_corrupted_snapshot(snapshot):
+    snapshot_dir = snapshot.export_snapshot()
+    with open(os.path.join(snapshot_dir, snapshot.CHUNKS_FILE), 'a') as file:
+        file.write("\n")
+    active_id = snapshot.generations.get_active_generation()
+
+    with pytest.raises(ValueError, match="checksum"):
+        snapshot.import_snapshot(snapshot_dir=snapshot_dir)
+    assert snapshot.generations.get_active_generation() == active_id
+
+
+def test_import_rejects_another_embedding_model(snapshot):
+    snapshot_dir = snapshot.export_snapshot()
+    other = KnowledgeBaseSnapshot(config=KnowledgeBaseSnapshotConfig(snapshots_dir=snapshot.config.snapshots_dir, embedding_model_name="other", batch_size=2),
+                                  vectordb_config=snapshot.vectordb_config)
+
+    with pytest.raises(ValueError, match="built with 'fake'"):
+        other.import_snapshot(snapshot_dir=snapshot_dir)
+
+
+def test_export_reads_a_single_generation(snapshot, monkeypatch):
+    exported_id = snapshot.generations.get_active_generation()
+    monkeypatch.setattr(KnowledgeBaseGenerations, "get_active_dir", lambda self: pytest.fail("the active generation is read twice"))
+
+    manifest = snapshot.verify_snapshot(snapshot_dir=snapshot.export_snapshot())
+    assert manifest["generation_id"] == exported_id and PATHS_FILE in manifest["files"]
@@ -0,0 +1,91 @@
+from chatwithcode.entity.config_entity import OnnxEmbeddingConfig
+from chatwithcode.components.onnx_embeddings import OnnxEmbeddingBackend
+import threading
+import pytest
+import time
+import os
+
+
+@pytest.fixture
+def backend(workdir):
+    return OnnxEmbeddingBackend(config=OnnxEmbeddingConfig(model_name="org/model", cache_dir=str(workdir / "onnx"), quantize=True, num_threads=1,
+                                                          max_length=16, batch_size=4, parity_threshold=0.99))
+
+
+def _fake_export(backend):
+    def export():
+        if not os.path.exists(backend.model_path):
+            os.makedirs(backend.model_dir, exist_ok=True)
+            for path in (backend.model_path, backend.tokenizer_path):
+                with open(f"{path}.tmp", 'w') as file:
+                    file.write(path)
+                os.replace(f"{path}.tmp", path)
+        return backend.model_path
+    return export
+
+
+def _fake_check_parity(backend, passed, checks):
+    original = OnnxEmbeddingBackend.check_parity
+
+    def check_parity(reference):
+        checks.append(reference)
+        time.sleep(0.05) # widen the window for concurrent workers
+        backend.create_embeddings = lambda: _Vectors(1.0 if passed else -1.0)
+        result = original(backend, reference=reference)
+        del backend.create_embeddings
+        return result
+    return check_parity
+
+
+class _Vectors:
+    def __init__(self, sign):
+        self.sign = sign
+
+    def embed_documents(self, texts):
+        return [[self.sign, 1.0] for _ in texts]
+
+
+def test_load_without_a_prepared_export_falls_back(backend):
+    assert backend.load() is None
+
+
+@pytest.mark.parametrize("passed", [True, False])
+def test_load_only_serves_an_export_that_passed_the_parity_check(backend, monkeypatch, passed):
+    checks = []
+    monkeypatch.setattr(backend, "export", _fake_export(backend))
+    monkeypatch.setattr(backend, "check_parity", _fake_check_parity(backend, passed, checks))
+
+    assert backend.prepare(reference_factory=lambda: _Vectors(1.0))["passed"] is passed
+    assert backend.prepare(reference_factory=lambda: _Vectors(1.0))["passed"] is passed # the check is cached
+    assert len(checks) == 1
+
+    monkeypatch.setattr(backend, "create_embeddings", lambda: "onnx")
+    assert backend.load() == ("onnx" if passed else None)
+
+
+def test_load_ignores_an_export_changed_after_the_check(backend, monkeypatch):
+    monkeypatch.setattr(backend, "export", _fake_export(backend))
+    monkeypatch.setattr(backend, "check_parity", _fake_check_parity(backend, True, []))
+    backend.prepare(reference_factory=lambda: _Vectors(1.0))
+
+    with open(backend.model_path, 'a') as file:
+        file.write("re-exported")
+    monkeypatch.setattr(backend, "create_embeddings", lambda: "onnx")
+    assert backend.load() is None
+
+
+def test_concurrent_prepare_checks_once(backend, monkeypatch):
+    checks = []
+    monkeypatch.setattr(backend, "export", _fake_export(backend))
+    monkeypatch.setattr(backend, "check_parity", _fake_check_parity(backend, True, checks))
+
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(backend.prepare(reference_factory=lambda: _Vectors(1.0)))) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(checks) == 1
+    assert all(result["passed"] for result in results)
+    assert not [name for name in os.listdir(backend.model_dir) if name.endswith(".tmp")]
@@ -0,0 +1,98 @@
+from chatwithcode.components.path_scope import PathScope, path_metadata, MAX_DIR_DEPTH
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+import importlib
+import pytest
+
+
+PATHS = [
+    "app.py",
+    "src/chatwithcode/components/data_ingestion.py",
+    "src/chatwithcode/components/symbol_index.py",
+    "src/chatwithcode/pipeline/chat_with_code.py",
+    "tests/test_path_scope.py",
+]
+
+
+def test_path_metadata():
+    assert path_metadata("src/chatwithcode/components/data_ingestion.py") == {
+        "path": "src/chatwithcode/components/data_ingestion.py",
+        "file_type": ".py",
+        "dir_1": "src",
+        "dir_2": "src/chatwithcode",
+        "dir_3": "src/chatwithcode/components",
+    }
+    assert path_metadata("app.py") == {"path": "app.py", "file_type": ".py"}
+
+
+def test_where_filters():
+    assert PathScope(["app.py"], PATHS).where == {"path": {"$eq": "app.py"}}
+    assert PathScope(["./src/chatwithcode/components/"], PATHS).where == {"dir_3": {"$eq": "src/chatwithcode/components"}}
+    assert PathScope(["tests/*.py"], PATHS).where == {"dir_1": {"$eq": "tests"}}
+    assert PathScope(["app.py", "tests"], PATHS).where == {"$or": [{"path": {"$eq": "app.py"}}, {"dir_1": {"$eq": "tests"}}]}
+
+
+def test_globs_use_the_file_type_and_directory_metadata():
+    paths = PATHS + ["README.md", "src/chatwithcode/components/prompts.txt"]
+    assert PathScope(["*.py"], paths).where == {"file_type": {"$eq": ".py"}}
+    assert PathScope(["*.md", "*.txt"], paths).where == {"$or": [{"file_type": {"$eq": ".md"}}, {"file_type": {"$eq": ".txt"}}]}
+    assert PathScope(["src/*/components/*"], paths).where == {"dir_3": {"$eq": "src/chatwithcode/components"}}
+    assert PathScope(["src/*.py"], paths).where == {"$and": [{"dir_2": {"$eq": "src/chatwithcode"}}, {"file_type": {"$eq": ".py"}}]}
+    assert PathScope(["*/symbol_*.py"], paths).where == {"path": {"$in": ["src/chatwithcode/components/symbol_index.py"]}}
+
+
+def test_patterns_selecting_every_file_drop_the_filter():
+    assert PathScope(["*.py"], PATHS).where is None
+    assert PathScope(["*"], PATHS).where is None
+    assert PathScope(["src", "app.py", "tests/*"], PATHS).where is None
+    assert PathScope(["*.py"], PATHS).matches("app.py")
+
+
+def test_deep_directories_fall_back_to_the_known_paths():
+    deep = "/".join(f"d{depth}" for depth in range(MAX_DIR_DEPTH + 1))
+    assert PathScope([deep], [f"{deep}/module.py", "app.py"]).where == {"path": {"$in": [f"{deep}/module.py"]}}
+
+
+@pytest.mark.parametrize("patterns", [[], ["  "], ["missing"], ["src/chat"], ["*.js"]])
+def test_invalid_scopes(patterns):
+    with pytest.raises(ValueError):
+        PathScope(patterns, PATHS)
+
+
+def test_matches():
+    scope = PathScope(["src/chatwithcode/components", "*.py"], PATHS)
+    assert scope.matches("src/chatwithcode/components/symbol_index.py")
+    assert scope.matches("app.py")
+    assert not PathScope(["tests"], PATHS).matches("src/chatwithcode/pipeline/chat_with_code.py")
+    assert not scope.matches(None)
+
+
+def test_chroma_applies_the_filter_inside_the_search(workdir):
+    vectordb = Chroma.from_documents(documents=[Document(page_content=f"code of {path}", metadata=path_metadata(path)) for path in PATHS],
+                                     embedding=DeterministicFakeEmbedding(size=8), persist_directory=str(workdir / "chromadb"))
+
+    for patterns, expected in ((["src/chatwithcode/components"], PATHS[1:3]), (["tests/*.py", "app.py"], [PATHS[0], PATHS[4]])):
+        found = vectordb.similarity_search("code", k=10, filter=PathScope(patterns, PATHS).where)
+        assert sorted(document.metadata["path"] for document in found) == expected
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"question": "what is load?", "mode": "fast"}, "unknown answer mode 'fast'"),
+    ({"question": "what is load?", "paths": "missing"}, "no indexed file under 'missing'"),
+    ({"question": "what is load?", "paths": ["*.js"]}, "no indexed file matches '*.js'"),
+])
+def test_invalid_questions_are_rejected_with_400(project, monkeypatch, body, message):
+    app = importlib.import_module("app")
+    ChatWithCode = app.ChatWithCode
+    predict = ChatWithCode.predict
+    def scoped_predict(self, question, mode="auto", paths=None):
+        if paths:
+            PathScope(paths, PATHS) # what the retriever does with the paths of the active knowledge base
+        return predict(self, question=question, mode=mode, paths=paths)
+    monkeypatch.setattr(ChatWithCode, "predict", scoped_predict)
+
+    response = app.app.test_client().post("/ask", json=body)
+
+    assert response.status_code == 400
+    assert message in response.get_json()["error"]
@@ -0,0 +1,109 @@
+from chatwithcode.entity.config_entity import ProfilingConfig
+from chatwithcode.components import profiler
+from chatwithcode.components.profiler import SamplingProfiler, MemoryProfiler, ProfilingSession
+from collections import Counter
+import threading
+import tracemalloc
+import time
+import pytest
+
+
+@pytest.fixture
+def config(workdir):
+    return ProfilingConfig(enabled=True, admin_token="secret", profiles_dir=workdir / "profiles", sample_interval=0.005, max_seconds=5,
+                           max_stack_depth=50, memory_frames=1, max_snapshots=3, top_stats=10)
+
+
+@pytest.fixture(autouse=True)
+def no_tracing(monkeypatch):
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc is already tracing (PYTHONTRACEMALLOC)")
+    monkeypatch.setattr(profiler, "_TRACING", {"users": 0, "started": False})
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        pytest.fail("tracemalloc is still tracing")
+
+
+def _busy_loop(stop:threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_collapsed_is_sorted_by_count():
+    cpu = SamplingProfiler(config=None)
+    cpu.stacks = Counter({"main;load (a.py:1)": 2, "main;predict (b.py:7);retriever (c.py:3)": 5})
+
+    assert cpu.collapsed() == "main;predict (b.py:7);retriever (c.py:3) 5\nmain;load (a.py:1) 2\n"
+
+
+def test_samples_only_the_given_threads(config):
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        cpu = SamplingProfiler(config=config).start(seconds=0.2, thread_ids={worker.ident})
+        time.sleep(0.1)
+        collapsed = cpu.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert cpu.samples > 0
+    assert all(line.startswith("_bootstrap") and "_busy_loop (test_profiler.py:" in line for line in collapsed.splitlines())
+
+
+def test_stops_after_the_requested_number_of_requests(config):
+    cpu = SamplingProfiler(config=config).start(requests=2)
+    cpu.request_finished()
+    time.sleep(0.05)
+    assert cpu.running
+
+    cpu.request_finished()
+    cpu._thread.join(timeout=1)
+    assert not cpu.running
+    assert cpu.status()["requests_left"] == 0 and cpu.status()["stopped_at"] is not None
+
+
+def test_diff_reports_the_growth_between_snapshots(config):
+    memory = MemoryProfiler(config=config)
+    memory.snapshot(label="before")
+    grown = [bytearray(1024) for _ in range(1000)]
+    memory.snapshot(label="after")
+
+    stats = memory.diff()
+    assert stats[0]["size_diff_kb"] >= 1000 and "test_profiler.py" in stats[0]["traceback"][0]
+    assert memory.diff(base="before", current="after") == stats
+    with pytest.raises(KeyError):
+        memory.diff(base="missing")
+
+    for label in ("1", "2", "3"):
+        memory.snapshot(label=label)
+    assert list(memory.snapshots) == ["1", "2", "3"] # at most max_snapshots
+    assert memory.stop() is False
+    del grown
+
+
+def test_concurrent_sessions_share_tracing(config):
+    first = ProfilingSession(config=config, kinds={"memory"}).start()
+    second = ProfilingSession(config=config, kinds={"memory"}).start()
+
+    assert first.finish() == [f"{first.name}.memory.txt"]
+    assert tracemalloc.is_tracing() # still needed by the second session
+    second.finish()
+    assert not tracemalloc.is_tracing()
+
+
+def test_sessions_never_stop_the_admin_profiler(config):
+    memory = MemoryProfiler(config=config)
+    memory.snapshot(label="base")
+
+    ProfilingSession(config=config, kinds={"memory"}).start().finish()
+    assert tracemalloc.is_tracing()
+    memory.snapshot(label="current")
+    assert memory.diff() is not None
+
+    session = ProfilingSession(config=config, kinds={"memory"}).start()
+    assert memory.stop() is True # the session still needs it
+    session.finish()
+    assert not tracemalloc.is_tracing()
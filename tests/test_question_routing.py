@@ -0,0 +1,57 @@
+from chatwithcode.components.repo_summaries import is_overview_question
+from chatwithcode.components.generate_answer import is_lookup_question
+import pytest
+
+
+@pytest.mark.parametrize("question", [
+    "Explain the code?",
+    "explain the whole repository",
+    "Summarize this project.",
+    "Give me an overview of the codebase",
+    "What does this repo do?",
+    "what is the project about",
+    "Walk me through the code",
+])
+def test_overview_questions(question):
+    assert is_overview_question(question)
+
+
+@pytest.mark.parametrize("question", [
+    "explain the code of StoreEmbeddings.retriever",
+    "Explain the code in data_ingestion.py",
+    "explain the code in src/chatwithcode/components",
+    "describe how create_knowledgebase handles the chroma package",
+    "Explain the code of `predict`",
+    "explain the code that clones the repository",
+    "How do I load and save the config?",
+    "",
+    None,
+])
+def test_specific_questions_are_not_overview_questions(question):
+    assert not is_overview_question(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Where is StoreEmbeddings defined?",
+    "where are the chunks stored",
+    "Show me the code for the retriever",
+    "show the implementation of predict",
+    "Find the definition of load_llm",
+    "find usages of get_data",
+    "definition of ConfigManager",
+    "Go to RepoScanner",
+])
+def test_lookup_questions(question):
+    assert is_lookup_question(question)
+
+
+@pytest.mark.parametrize("question", [
+    "How does the retriever work?",
+    "Why is the code showing an error?",
+    "Explain the code",
+    "Can you show how the knowledge base is built?",
+    "",
+    None,
+])
+def test_other_questions_are_not_lookup_questions(question):
+    assert not is_lookup_question(question)
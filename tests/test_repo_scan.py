@@ -0,0 +1,115 @@
+from chatwithcode.entity.config_entity import RepoScanConfig
+from chatwithcode.components.repo_scan import RepoScanner, RepoBudgetExceeded
+from chatwithcode.components.data_ingestion import DataIngestion
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from conftest import ROOT_DIR, write_files
+import importlib
+import os
+import pytest
+import yaml
+
+
+def make_config(github_dir, **overrides) -> RepoScanConfig:
+    settings = dict(suffixes=[".py"], ignore_patterns=["vendor/*", "*_pb2.py"], max_file_bytes=10_000, max_line_length=500,
+                    max_avg_line_length=120, chunk_size=100, overlap=20, chunks_per_second=10,
+                    max_files=100, max_bytes=1_000_000, max_chunks=1000)
+    settings.update(overrides)
+    return RepoScanConfig(github_dir=str(github_dir), report_file=os.path.join(os.getcwd(), "scan_report.json"), **settings)
+
+
+@pytest.fixture
+def scanner(workdir):
+    return RepoScanner(config=make_config(workdir / "github"))
+
+
+def skip_reason(scanner, workdir, content) -> str:
+    file_path = str(workdir / "module.py")
+    with open(file_path, 'w' if isinstance(content, str) else 'wb') as file:
+        file.write(content)
+    return scanner.skip_reason(file_path=file_path, size=os.path.getsize(file_path))
+
+
+@pytest.mark.parametrize("content", [
+    "def main():\n    return 1\n",
+    '"""\n    The report is generated by the scanner, do not edit it by hand.\n"""\n',
+    "# This module documents how files are generated by tools.\nGENERATED = 'auto-generated'\n",
+    "MARKERS = ('@generated', 'DO NOT EDIT')\n",
+])
+def test_normal_files_are_kept(scanner, workdir, content):
+    assert skip_reason(scanner, workdir, content) is None
+
+
+@pytest.mark.parametrize("content", [
+    "# @generated\nx = 1\n",
+    "# Code generated by protoc-gen-go. DO NOT EDIT.\nx = 1\n",
+    "# -*- coding: utf-8 -*-\n# Generated by the protocol buffer compiler.  DO NOT EDIT!\n# source: api.proto\n",
+    "#!/usr/bin/env python\n# This file was automatically generated by SWIG.\n",
+])
+def test_generated_headers(scanner, workdir, content):
+    assert skip_reason(scanner, workdir, content) == "generated"
+
+
+def test_other_skip_reasons(scanner, workdir):
+    assert skip_reason(scanner, workdir, "x = 1\n" * 5000) == "too large"
+    assert skip_reason(scanner, workdir, b"\x00\x01binary") == "binary"
+    assert skip_reason(scanner, workdir, "x=1;" * 200 + "\n") == "minified"
+
+
+def test_is_ignored_at_any_depth(scanner):
+    assert scanner.is_ignored("vendor/lib.py")
+    assert scanner.is_ignored("src/vendor/lib/module.py")
+    assert scanner.is_ignored("api/service_pb2.py")
+    assert not scanner.is_ignored("src/vendors.py")
+
+
+def test_scan_report(scanner, workdir):
+    write_files(workdir / "github", {
+        "pkg/a.py": "x = 1\n" * 50,
+        "pkg/b.py": "def b():\n    pass\n",
+        "vendor/lib.py": "x = 1\n",
+        "pkg/api_pb2.py": "x = 1\n",
+        "README.md": "# readme\n",
+        ".hidden/c.py": "x = 1\n",
+    })
+    report = scanner.scan()
+
+    assert report["skipped"] == {"vendor/lib.py": "ignore list", "pkg/api_pb2.py": "ignore list"}
+    assert report["directories"]["pkg"]["files"] == 2
+    assert report["totals"]["estimated_chunks"] == scanner.estimate_chunks(300) + scanner.estimate_chunks(22) == 5
+    assert os.path.exists(scanner.config.report_file)
+
+
+def test_scan_keeps_every_source_of_this_repository(workdir):
+    with open(os.path.join(ROOT_DIR, "params.yaml")) as file:
+        scan = yaml.safe_load(file)["scan"]
+    limits = {key: scan[key] for key in ("max_file_bytes", "max_line_length", "max_avg_line_length")}
+    report = RepoScanner(config=make_config(os.path.join(ROOT_DIR, "src"), max_files=10_000, max_bytes=10**9, max_chunks=10**6, **limits)).scan()
+    assert report["skipped"] == {}
+
+
+def test_enforce_budgets_names_the_heaviest_directories(workdir):
+    write_files(workdir / "github", {"big/a.py": "x = 1\n" * 100, "small/b.py": "x = 1\n"})
+    with pytest.raises(RepoBudgetExceeded) as error:
+        RepoScanner(config=make_config(workdir / "github", max_chunks=3)).scan()
+    assert "(chunks 9 > 3)" in str(error.value)
+    assert "heaviest directories: big (8 chunks), small (1 chunks)" in str(error.value)
+
+
+def test_rejected_repository_is_reported_by_the_web_app(project, monkeypatch):
+    with open("params.yaml") as file:
+        params = yaml.safe_load(file)
+    params["scan"]["max_files"] = 1
+    with open("params.yaml", 'w') as file:
+        yaml.safe_dump(params, file)
+
+    def get_data(self, url):
+        write_files(self.config.github_dir, {"a.py": "x = 1\n", "b.py": "y = 2\n"})
+    monkeypatch.setattr(DataIngestion, "get_data", get_data)
+    monkeypatch.setattr(DataIngestion, "get_commit", lambda self: "abc123")
+    monkeypatch.setattr(StoreEmbeddings, "build_knowledgebase", lambda *args, **kwargs: pytest.fail("embedding started"))
+
+    app = importlib.import_module("app").app
+    response = app.test_client().post("/get_url", data={"url": "https://github.com/example/repo.git"})
+
+    assert response.status_code == 200
+    assert b"repository rejected, it exceeds the ingestion budget (files 2 &gt; 1)" in response.data
@@ -0,0 +1,121 @@
+from chatwithcode.entity.config_entity import SymbolIndexConfig
+from chatwithcode.components import symbol_index
+from chatwithcode.components.symbol_index import SymbolIndex, SymbolExpandedRetriever, code_tokens
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from conftest import write_files
+from typing import List
+import pytest
+import os
+
+
+SOURCES = {
+    "app/config.py": (
+        "def load(path):\n    return read(path)\n\n\n"
+        "def save(path, data):\n    return write(path, data)\n\n\n"
+        "def read(path):\n    return open(path).read()\n\n\n"
+        "def write(path, data):\n    return open(path, 'w').write(data)\n"
+    ),
+    "app/service.py": (
+        "from app.config import load\n\n\n"
+        "class StoreEmbeddings:\n"
+        "    def __init__(self):\n        self.k = 1\n\n"
+        "    def retriever(self, k):\n        return load(k)\n\n"
+        "    def start(self):\n        pass\n\n"
+        "    def build_knowledgebase(self):\n        return self.retriever(1)\n"
+    ),
+    "app/pipeline.py": (
+        "from app.service import StoreEmbeddings\n\n\n"
+        "class Pipeline:\n"
+        "    def __init__(self):\n        self.emb = StoreEmbeddings()\n\n"
+        "    def run(self, data):\n"
+        "        if data.get('rebuild'):\n            self.emb.start()\n"
+        "        return self.emb.retriever(data.load())\n"
+    ),
+}
+
+
+@pytest.fixture
+def index(workdir):
+    write_files(workdir / "github", SOURCES)
+    return SymbolIndex(config=SymbolIndexConfig(github_dir=str(workdir / "github"), max_snippet_chars=2500, max_direct=3, max_expansions=4)).build()
+
+
+def test_code_tokens_ignores_plain_words():
+    assert code_tokens("How do I load and save the config?") == []
+    assert code_tokens("How does the app go from start to end?") == []
+    assert code_tokens("How is `load` used by StoreEmbeddings.retriever and build_knowledgebase() or save()?") == [
+        "load", "StoreEmbeddings.retriever", "build_knowledgebase", "save"
+    ]
+
+
+def test_find_identifiers_only_matches_code_like_tokens(index):
+    assert index.find_identifiers("How do I load and save the config?") == []
+    assert index.find_identifiers("How do we handle errors during the build, from start to end?") == []
+    assert index.find_identifiers("What does StoreEmbeddings.retriever call, and where is `load`?") == ["StoreEmbeddings.retriever", "load"]
+    assert index.find_identifiers("Where is UnknownClass.method or not_a_symbol?") == []
+
+
+def test_lookup_qualified_and_short_names(index):
+    assert [definition["path"] for definition in index.lookup("load")] == ["app/config.py"]
+    assert [definition["qualname"] for definition in index.lookup("StoreEmbeddings.retriever")] == ["StoreEmbeddings.retriever"]
+    assert [definition["qualname"] for definition in index.lookup("retriever")] == ["StoreEmbeddings.retriever"]
+    assert index.lookup("Other.retriever") == []
+    assert index.lookup("missing") == []
+
+
+def test_referenced_definitions_follow_the_call_graph(index):
+    document = Document(page_content=SOURCES["app/service.py"], metadata={"path": "app/service.py"})
+    assert "load" in {definition["qualname"] for definition in index.referenced_definitions(document)}
+
+
+def test_referenced_definitions_resolve_receivers_and_constructors(index):
+    run, init = index.lookup("Pipeline.run")[0], index.lookup("Pipeline.__init__")[0]
+
+    # self.emb is a StoreEmbeddings: its methods, main path first; data.get()/data.load() are not resolved to app.config.load
+    assert [definition["qualname"] for definition in index.referenced_definitions(index.to_document(run))] == [
+        "StoreEmbeddings.retriever", "StoreEmbeddings.start"
+    ]
+    # calling a class expands to its __init__, not to the whole class body
+    assert [definition["qualname"] for definition in index.referenced_definitions(index.to_document(init))] == ["StoreEmbeddings.__init__"]
+
+
+def test_predict_expands_to_the_retriever_and_the_qa_chain(workdir):
+    src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    index = SymbolIndex(config=SymbolIndexConfig(github_dir=src_dir, max_snippet_chars=2500, max_direct=3, max_expansions=4)).build()
+    predict = index.lookup("ChatWithCode.predict")[0]
+
+    expanded = [definition["qualname"] for definition in index.referenced_definitions(index.to_document(predict))][:4]
+
+    assert "StoreEmbeddings.retriever" in expanded
+    assert "GenerateResponse.qa_llm" in expanded
+    assert not any(definition["kind"] == "class" for definition in index.referenced_definitions(index.to_document(predict)))
+
+
+class _StaticRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return self.documents
+
+
+def test_direct_hits_leave_room_for_the_similarity_search(index):
+    similar = [Document(page_content=f"chunk {number}", metadata={"source": f"file{number}.py"}) for number in range(10)]
+    retriever = SymbolExpandedRetriever(vector_retriever=_StaticRetriever(documents=similar), symbol_index=index, k=6, max_direct=2, max_expansions=0)
+
+    documents = retriever.get_relevant_documents("Compare `load`, `save`, `read` and `write`")
+
+    assert len(documents) == 6
+    assert sum(1 for document in documents if "symbol" in document.metadata) == 2
+    assert [document.page_content for document in documents[2:]] == ["chunk 0", "chunk 1", "chunk 2", "chunk 3"]
+
+
+def test_load_keeps_only_the_latest_generation(index, workdir):
+    for generation in ("gen1", "gen2"):
+        (workdir / generation).mkdir()
+        index.save(generation_dir=str(workdir / generation))
+
+    assert SymbolIndex(config=index.config).load(generation_dir=str(workdir / "gen1"))
+    assert SymbolIndex(config=index.config).load(generation_dir=str(workdir / "gen2"))
+    assert list(symbol_index._LOADED_INDEXES) == [str(workdir / "gen2" / SymbolIndex.SYMBOLS_FILE)]
+    assert not SymbolIndex(config=index.config).load(generation_dir=str(workdir))
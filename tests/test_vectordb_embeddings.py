@@ -0,0 +1,75 @@
+from chatwithcode.components.vectordb_embeddings import StoreEmbeddings
+from chatwithcode.components.knowledgebase_generations import KnowledgeBaseGenerations
+from chatwithcode.utils.common_utils import read_json_file
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_chroma import Chroma
+from conftest import write_files, make_vectordb_config
+import os
+import pytest
+
+
+SOURCE = {"url": "https://github.com/example/repo.git", "commit": "abc123"}
+
+
+@pytest.fixture
+def config(workdir):
+    write_files(workdir / "github", {
+        "pkg/__init__.py": "",
+        "pkg/a.py": "def first():\n    return 1\n",
+        "pkg/b.py": "def second():\n    return 2\n",
+        "pkg/c.py": "class Third:\n    pass\n",
+        "main.py": "from pkg.a import first\n\nprint(first())\n",
+    })
+    return make_vectordb_config(workdir)
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """
+        Replaces the embedding model by a fake one and records the chunks sent to chromadb.
+    """
+    monkeypatch.setattr(StoreEmbeddings, "load_embedding_model", lambda self: DeterministicFakeEmbedding(size=8))
+    calls = {"documents": [], "fail_at": None}
+    add_documents = Chroma.add_documents
+
+    def record(self, documents, **kwargs):
+        if calls["fail_at"] is not None and len(calls["documents"]) >= calls["fail_at"]:
+            raise RuntimeError("crash during indexing")
+        calls["documents"].extend(document.metadata["path"] for document in documents)
+        return add_documents(self, documents, **kwargs)
+
+    monkeypatch.setattr(Chroma, "add_documents", record)
+    return calls
+
+
+def test_build_knowledgebase_resumes_from_checkpoint(config, embedded):
+    embedded["fail_at"] = 2
+    with pytest.raises(RuntimeError):
+        StoreEmbeddings(config=config).build_knowledgebase(source=SOURCE)
+    checkpoint = read_json_file(file_path=config.checkpoint_file)
+    files_done = {os.path.relpath(source, config.github_dir) for source in checkpoint["files_done"]}
+    assert files_done and len(embedded["documents"]) == 2
+
+    embedded["fail_at"] = None
+    embedded["documents"].clear()
+    chunks = StoreEmbeddings(config=config).build_knowledgebase(source=SOURCE)
+
+    assert chunks == 4 # the empty __init__.py has no chunk
+    assert not files_done & set(embedded["documents"]) # committed files are not embedded again
+    assert not os.path.exists(config.checkpoint_file)
+
+    generations = KnowledgeBaseGenerations(config=config)
+    assert generations.get_active_metadata()["status"] == "active"
+    assert generations.get_active_metadata()["chunks"] == 4
+
+
+def test_build_knowledgebase_starts_over_for_another_commit(config, embedded):
+    embedded["fail_at"] = 2
+    with pytest.raises(RuntimeError):
+        StoreEmbeddings(config=config).build_knowledgebase(source=SOURCE)
+
+    embedded["fail_at"] = None
+    embedded["documents"].clear()
+    StoreEmbeddings(config=config).build_knowledgebase(source=dict(SOURCE, commit="def456"))
+
+    assert len(embedded["documents"]) == 4 # the stale checkpoint is discarded, every file is embedded